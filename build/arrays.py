@@ -0,0 +1,233 @@
+from llvmlite import ir
+
+# Heap arrays and the kernels behind whole-array operations. A heap array
+# is a single malloc'd block: an i64 length followed by the i32 elements.
+# Kernels are emitted on first use as internal functions whose main loop
+# works on <VECTOR_WIDTH x i32> vectors, with a scalar loop for the tail,
+# so they use SIMD even when the module is not optimized.
+
+VECTOR_WIDTH = 8
+
+i1 = ir.IntType(1)
+i8 = ir.IntType(8)
+i32 = ir.IntType(32)
+i64 = ir.IntType(64)
+i8_ptr = i8.as_pointer()
+i32_ptr = i32.as_pointer()
+vec_type = ir.VectorType(i32, VECTOR_WIDTH)
+vec_ptr = vec_type.as_pointer()
+
+ARRAY_TYPE = ir.LiteralStructType([i64, ir.ArrayType(i32, 0)])
+ARRAY_PTR = ARRAY_TYPE.as_pointer()
+HEADER_SIZE = 8
+
+BINARY_OPS = {"PLUS": "add", "MINUS": "sub", "TIMES": "mul", "DIVIDE": "sdiv"}
+REDUCE_IDENTITY = {"sum": 0, "min": 2 ** 31 - 1, "max": -2 ** 31}
+
+
+def _const(ty, value):
+    return ir.Constant(ty, value)
+
+
+def splat(builder, value):
+    vec = builder.insert_element(ir.Constant(vec_type, None), value, _const(i32, 0))
+    return builder.shuffle_vector(vec, ir.Constant(vec_type, None), ir.Constant(vec_type, None))
+
+
+def load_vector(builder, ptr, index):
+    return builder.load(builder.bitcast(builder.gep(ptr, [index]), vec_ptr), align=4)
+
+
+def store_vector(builder, value, ptr, index):
+    builder.store(value, builder.bitcast(builder.gep(ptr, [index]), vec_ptr), align=4)
+
+
+def counted_loop(builder, func, start, end, step, carried, body, name):
+    # for (i = start; i + step <= end; i += step), threading the values in
+    # `carried` through phis; leaves the builder in the exit block and
+    # returns the final index and carried values.
+    pre = builder.block
+    header = func.append_basic_block(f"{name}.head")
+    body_block = func.append_basic_block(f"{name}.body")
+    exit_block = func.append_basic_block(f"{name}.exit")
+    builder.branch(header)
+
+    builder.position_at_end(header)
+    index = builder.phi(i32)
+    index.add_incoming(start, pre)
+    phis = []
+    for value in carried:
+        phi = builder.phi(value.type)
+        phi.add_incoming(value, pre)
+        phis.append(phi)
+    more = builder.icmp_signed("<=", builder.add(index, _const(i32, step)), end)
+    builder.cbranch(more, body_block, exit_block)
+
+    builder.position_at_end(body_block)
+    updated = body(builder, index, phis)
+    next_index = builder.add(index, _const(i32, step))
+    latch = builder.block
+    index.add_incoming(next_index, latch)
+    for phi, value in zip(phis, updated):
+        phi.add_incoming(value, latch)
+    builder.branch(header)
+
+    builder.position_at_end(exit_block)
+    return index, phis
+
+
+def combine(builder, op, a, b):
+    if op == "sum":
+        return builder.add(a, b)
+    cmp = "<" if op == "min" else ">"
+    return builder.select(builder.icmp_signed(cmp, a, b), a, b)
+
+
+class ArrayKernels:
+    def __init__(self, module):
+        self.module = module
+        self.kernels = {}
+
+    def libc(self, name, func_type):
+        try:
+            return self.module.get_global(name)
+        except KeyError:
+            return ir.Function(self.module, func_type, name=name)
+
+    def malloc(self):
+        return self.libc("malloc", ir.FunctionType(i8_ptr, [i64]))
+
+    def calloc(self):
+        return self.libc("calloc", ir.FunctionType(i8_ptr, [i64, i64]))
+
+    def free(self):
+        return self.libc("free", ir.FunctionType(ir.VoidType(), [i8_ptr]))
+
+    def memcpy(self):
+        return self.module.declare_intrinsic('llvm.memcpy', [i8_ptr, i8_ptr, i64])
+
+    def _kernel(self, name, func_type, build):
+        func = self.kernels.get(name)
+        if func is None:
+            func = ir.Function(self.module, func_type, name=name)
+            func.linkage = 'internal'
+            self.kernels[name] = func
+            build(func, ir.IRBuilder(func.append_basic_block("entry")))
+        return func
+
+    def binop(self, op, left_is_array, right_is_array):
+        # out[i] = left[i] op right[i]; either side may be a broadcast scalar
+        kinds = ("v" if left_is_array else "s") + ("v" if right_is_array else "s")
+        name = f"chitii.vec.{BINARY_OPS[op]}.{kinds}"
+        left_ty = i32_ptr if left_is_array else i32
+        right_ty = i32_ptr if right_is_array else i32
+        func_type = ir.FunctionType(ir.VoidType(), [i32_ptr, left_ty, right_ty, i32])
+        emit = getattr(ir.IRBuilder, BINARY_OPS[op])
+
+        def build(func, builder):
+            out, left, right, n = func.args
+            left_vec = None if left_is_array else splat(builder, left)
+            right_vec = None if right_is_array else splat(builder, right)
+
+            def vector_body(builder, i, carried):
+                lhs = load_vector(builder, left, i) if left_is_array else left_vec
+                rhs = load_vector(builder, right, i) if right_is_array else right_vec
+                store_vector(builder, emit(builder, lhs, rhs), out, i)
+                return []
+
+            def scalar_body(builder, i, carried):
+                lhs = builder.load(builder.gep(left, [i])) if left_is_array else left
+                rhs = builder.load(builder.gep(right, [i])) if right_is_array else right
+                builder.store(emit(builder, lhs, rhs), builder.gep(out, [i]))
+                return []
+
+            i, _ = counted_loop(builder, func, _const(i32, 0), n, VECTOR_WIDTH, [], vector_body, "vec")
+            counted_loop(builder, func, i, n, 1, [], scalar_body, "tail")
+            builder.ret_void()
+
+        return self._kernel(name, func_type, build)
+
+    def division_faults(self, left_is_array, right_is_array):
+        # Counts the lanes of left / right that would trap: a zero divisor,
+        # or INT_MIN / -1
+        kinds = ("v" if left_is_array else "s") + ("v" if right_is_array else "s")
+        left_ty = i32_ptr if left_is_array else i32
+        right_ty = i32_ptr if right_is_array else i32
+        func_type = ir.FunctionType(i32, [left_ty, right_ty, i32])
+
+        def faults(builder, lhs, rhs, like):
+            def const(value):
+                value = _const(i32, value)
+                return splat(builder, value) if like is vec_type else value
+            overflow = builder.and_(builder.icmp_signed("==", lhs, const(-2 ** 31)),
+                                    builder.icmp_signed("==", rhs, const(-1)))
+            return builder.zext(builder.or_(builder.icmp_signed("==", rhs, const(0)), overflow), like)
+
+        def build(func, builder):
+            left, right, n = func.args
+            left_vec = None if left_is_array else splat(builder, left)
+            right_vec = None if right_is_array else splat(builder, right)
+
+            def vector_body(builder, i, carried):
+                lhs = load_vector(builder, left, i) if left_is_array else left_vec
+                rhs = load_vector(builder, right, i) if right_is_array else right_vec
+                return [builder.add(carried[0], faults(builder, lhs, rhs, vec_type))]
+
+            def scalar_body(builder, i, carried):
+                lhs = builder.load(builder.gep(left, [i])) if left_is_array else left
+                rhs = builder.load(builder.gep(right, [i])) if right_is_array else right
+                return [builder.add(carried[0], faults(builder, lhs, rhs, i32))]
+
+            i, (acc,) = counted_loop(builder, func, _const(i32, 0), n, VECTOR_WIDTH,
+                                     [splat(builder, _const(i32, 0))], vector_body, "vec")
+            total = builder.extract_element(acc, _const(i32, 0))
+            for lane in range(1, VECTOR_WIDTH):
+                total = builder.add(total, builder.extract_element(acc, _const(i32, lane)))
+            _, (total,) = counted_loop(builder, func, i, n, 1, [total], scalar_body, "tail")
+            builder.ret(total)
+
+        return self._kernel(f"chitii.vec.divfaults.{kinds}", func_type, build)
+
+    def reduce(self, op):
+        func_type = ir.FunctionType(i32, [i32_ptr, i32])
+
+        def build(func, builder):
+            data, n = func.args
+            identity = _const(i32, REDUCE_IDENTITY[op])
+
+            def vector_body(builder, i, carried):
+                return [combine(builder, op, carried[0], load_vector(builder, data, i))]
+
+            def scalar_body(builder, i, carried):
+                return [combine(builder, op, carried[0], builder.load(builder.gep(data, [i])))]
+
+            i, (acc,) = counted_loop(builder, func, _const(i32, 0), n, VECTOR_WIDTH,
+                                     [splat(builder, identity)], vector_body, "vec")
+            total = builder.extract_element(acc, _const(i32, 0))
+            for lane in range(1, VECTOR_WIDTH):
+                total = combine(builder, op, total, builder.extract_element(acc, _const(i32, lane)))
+            _, (total,) = counted_loop(builder, func, i, n, 1, [total], scalar_body, "tail")
+            builder.ret(total)
+
+        return self._kernel(f"chitii.vec.{op}", func_type, build)
+
+    def fill(self):
+        func_type = ir.FunctionType(ir.VoidType(), [i32_ptr, i32, i32])
+
+        def build(func, builder):
+            data, value, n = func.args
+            value_vec = splat(builder, value)
+
+            def vector_body(builder, i, carried):
+                store_vector(builder, value_vec, data, i)
+                return []
+
+            def scalar_body(builder, i, carried):
+                builder.store(value, builder.gep(data, [i]))
+                return []
+
+            i, _ = counted_loop(builder, func, _const(i32, 0), n, VECTOR_WIDTH, [], vector_body, "vec")
+            counted_loop(builder, func, i, n, 1, [], scalar_body, "tail")
+            builder.ret_void()
+
+        return self._kernel("chitii.vec.fill", func_type, build)
@@ -0,0 +1,74 @@
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+
+from llvmlite import binding
+from build.lexer import tokenize
+from build.parser import Parser
+from build.codegen import CodeGen, StdioCodeGen, initialize_llvm
+
+# Compares the buffered runtime against the printf/scanf lowering on a
+# generated program that prints and reads many values.
+
+
+def make_program(prints, inputs):
+    lines = []
+    for i in range(inputs):
+        lines.append(f"v{i % 100} = input()")
+        lines.append(f"print v{i % 100}")
+    for i in range(prints):
+        lines.append(f"print {i * 7919 % 100003}" if i % 2 else f'print "line {i}"')
+    return "\n".join(lines)
+
+
+def build_executable(source_code, codegen_cls, path, cc):
+    codegen = codegen_cls()
+    codegen.generate(Parser(tokenize(source_code)).parse())
+    mod = binding.parse_assembly(str(codegen.finish()))
+    mod.verify()
+    target_machine = binding.Target.from_default_triple().create_target_machine(reloc="pic")
+    with open(path + ".o", "wb") as f:
+        f.write(target_machine.emit_object(mod))
+    subprocess.run([cc, path + ".o", "-o", path], check=True)
+
+
+def time_executable(path, stdin_path, repeat):
+    best = None
+    for _ in range(repeat):
+        with open(stdin_path, "rb") as stdin, open(os.devnull, "wb") as devnull:
+            start = time.perf_counter()
+            subprocess.run([path], stdin=stdin, stdout=devnull, check=False)
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark buffered runtime I/O against printf/scanf")
+    arg_parser.add_argument("--prints", type=int, default=20000)
+    arg_parser.add_argument("--inputs", type=int, default=10000)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--cc", default="clang", help="compiler used to link the object files")
+    args = arg_parser.parse_args()
+
+    initialize_llvm()
+    source_code = make_program(args.prints, args.inputs)
+    with tempfile.TemporaryDirectory() as tmp:
+        stdin_path = os.path.join(tmp, "input.txt")
+        with open(stdin_path, "w") as f:
+            f.write("\n".join(str(i * 31 - 5000) for i in range(args.inputs)))
+
+        results = {}
+        for name, codegen_cls in (("printf/scanf", StdioCodeGen), ("buffered", CodeGen)):
+            path = os.path.join(tmp, name.replace("/", "_"))
+            build_executable(source_code, codegen_cls, path, args.cc)
+            results[name] = time_executable(path, stdin_path, args.repeat)
+            print(f"{name:>12}: {results[name] * 1000:.1f} ms")
+
+    print(f"Speedup: {results['printf/scanf'] / results['buffered']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import argparse
+import time
+import tracemalloc
+
+from build.lexer import TokenStream, tokenize
+from build.parser import Parser
+
+# Measures lexing and parsing throughput on a generated program of many
+# arithmetic statements, plus the peak memory of the resulting AST.
+
+
+def make_program(statements):
+    lines = ["v = 1", "x = 2"]
+    for i in range(statements):
+        lines.append(f"v = {i} + v * (3 - x) / 2")
+    lines.append("print v")
+    return "\n".join(lines)
+
+
+def time_parse(source_code, make_tokens, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        Parser(make_tokens(source_code)).parse()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def peak_memory(source_code):
+    tracemalloc.start()
+    ast = Parser(TokenStream(source_code)).parse()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del ast
+    return peak
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark the lexer and parser on a generated program")
+    arg_parser.add_argument("--statements", type=int, default=100000)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    source_code = make_program(args.statements)
+    print(f"{args.statements} statements, {len(source_code) / 1e6:.1f} MB of source")
+    for name, make_tokens in (("token list", tokenize), ("token stream", TokenStream)):
+        elapsed = time_parse(source_code, make_tokens, args.repeat)
+        print(f"{name:>12}: {elapsed:.2f}s ({args.statements / elapsed:,.0f} statements/s)")
+    print(f"Peak memory while parsing: {peak_memory(source_code) / 1e6:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
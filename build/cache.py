@@ -0,0 +1,195 @@
+import glob
+import hashlib
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+from llvmlite import binding
+from build import __version__
+from build.optimizer import optimize_module
+
+DEFAULT_CACHE_DIR = ".chitii_cache"
+
+_HEADER = struct.Struct("<QII")
+
+_fingerprint = None
+
+
+def compiler_fingerprint():
+    # Hash of the compiler's own sources and the LLVM it links against, so
+    # any change to codegen, the runtime or the passes invalidates old
+    # entries without anyone having to bump __version__.
+    global _fingerprint
+    if _fingerprint is None:
+        _fingerprint = hash_sources(os.path.dirname(os.path.abspath(__file__)))
+    return _fingerprint
+
+
+def hash_sources(package_dir):
+    h = hashlib.sha256()
+    h.update(".".join(map(str, binding.llvm_version_info)).encode("utf8"))
+    for path in sorted(glob.glob(os.path.join(package_dir, "*.py"))):
+        h.update(os.path.basename(path).encode("utf8"))
+        h.update(b"\0")
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+class CacheEntry:
+    def __init__(self, llvm_ir, object_code, instructions=(0, 0)):
+        self.llvm_ir = llvm_ir
+        self.object_code = object_code
+        # Instruction counts before and after the LLVM pass pipeline
+        self.instructions = instructions
+
+    def size(self):
+        return len(self.llvm_ir) + len(self.object_code)
+
+    def to_bytes(self):
+        ir_bytes = self.llvm_ir.encode("utf8")
+        return _HEADER.pack(len(ir_bytes), *self.instructions) + ir_bytes + self.object_code
+
+    @classmethod
+    def from_bytes(cls, data):
+        ir_len, before, after = _HEADER.unpack_from(data)
+        start = _HEADER.size
+        if start + ir_len > len(data):
+            raise ValueError("truncated cache entry")
+        llvm_ir = data[start:start + ir_len].decode("utf8")
+        return cls(llvm_ir, bytes(data[start + ir_len:]), (before, after))
+
+
+class CompileCache:
+    def __init__(self, max_entries=128, cache_dir=DEFAULT_CACHE_DIR, max_disk_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(source_code, opt_level=0, variant="native"):
+        # Object code is target specific, so the triple is part of the key too
+        h = hashlib.sha256()
+        for part in (__version__, compiler_fingerprint(), binding.get_default_triple(), variant, str(opt_level)):
+            h.update(part.encode("utf8"))
+            h.update(b"\0")
+        h.update(source_code.encode("utf8"))
+        return h.hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        entry = self._load(key)
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key, entry):
+        with self.lock:
+            self._remember(key, entry)
+        self._store(key, entry)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self.memory),
+            }
+
+    def _remember(self, key, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".entry")
+
+    def _load(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            entry = CacheEntry.from_bytes(data)
+        except (struct.error, ValueError):
+            os.remove(path)
+            return None
+        # The mtime doubles as the last-used time for eviction
+        os.utime(path)
+        return entry
+
+    def _store(self, key, entry):
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(entry.to_bytes())
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        files = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".entry"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+
+def emit_entry(llvm_ir, target_machine, context=None, opt_level=0):
+    mod = binding.parse_assembly(str(llvm_ir), context=context)
+    mod.verify()
+    instructions = optimize_module(mod, opt_level, target_machine)
+    return CacheEntry(str(mod), target_machine.emit_object(mod), instructions)
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = CompileCache()
+        return _default_cache
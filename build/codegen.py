@@ -1,24 +1,48 @@
 from llvmlite import ir, binding
 from build.my_ast import Number, BinOp, Assign, Var, FunctionDef, FunctionCall, Return, Print, Input, StringLiteral, ArrayLiteral, ArrayAccess
+from build.my_ast import ArrayAlloc, ArrayLength, ArrayReduce, ArrayFill, ArrayCopy
+from build.runtime import define_runtime
+from build.arrays import ArrayKernels, ARRAY_PTR, HEADER_SIZE
 
-class CodeGen:
-    def __init__(self):
+NODE_HANDLERS = {
+    Number: "gen_number",
+    StringLiteral: "gen_string",
+    BinOp: "gen_binop",
+    ArrayLiteral: "gen_array_literal",
+    ArrayAccess: "gen_array_access",
+    Assign: "gen_assign",
+    Var: "gen_var",
+    FunctionDef: "gen_function_def",
+    Return: "gen_return",
+    FunctionCall: "gen_function_call",
+    Print: "gen_print",
+    Input: "gen_input",
+    ArrayAlloc: "gen_array_alloc",
+    ArrayLength: "gen_array_length",
+    ArrayReduce: "gen_array_reduce",
+    ArrayFill: "gen_array_fill",
+    ArrayCopy: "gen_array_copy",
+}
+
+_llvm_initialized = False
+
+def initialize_llvm():
+    global _llvm_initialized
+    if not _llvm_initialized:
         binding.initialize()
         binding.initialize_native_target()
         binding.initialize_native_asmprinter()
+        _llvm_initialized = True
+
+class CodeGen:
+    def __init__(self, entry_name="main"):
+        initialize_llvm()
 
         self.module = ir.Module(name="main")
         self.module.triple = binding.get_default_triple()
 
-        voidptr_ty = ir.IntType(8).as_pointer()
-        printf_ty = ir.FunctionType(ir.IntType(32), [voidptr_ty], var_arg=True)
-        self.printf = ir.Function(self.module, printf_ty, name="printf")
-
-        scanf_ty = ir.FunctionType(ir.IntType(32), [voidptr_ty], var_arg=True)
-        self.scanf = ir.Function(self.module, scanf_ty, name="scanf")
-
         func_type = ir.FunctionType(ir.IntType(32), [])
-        self.main_func = ir.Function(self.module, func_type, name="main")
+        self.main_func = ir.Function(self.module, func_type, name=entry_name)
 
         block = self.main_func.append_basic_block(name="entry")
         self.builder = ir.IRBuilder(block)
@@ -26,167 +50,438 @@ class CodeGen:
         self.variables = {}
         self.functions = {}
 
-        fmt_int = "%d\n\0"
-        self.fmt_str_int = ir.GlobalVariable(self.module, ir.ArrayType(ir.IntType(8), len(fmt_int)), name="fmtstrint")
-        self.fmt_str_int.linkage = 'internal'
-        self.fmt_str_int.global_constant = True
-        self.fmt_str_int.initializer = ir.Constant(ir.ArrayType(ir.IntType(8), len(fmt_int)),
-                                                   bytearray(fmt_int.encode("utf8")))
+        # One internal constant per distinct string, shared by string
+        # literals and format strings alike
+        self.strings = {}
+
+        self.setup_runtime()
+
+        # Whole-array kernels, emitted into the module on first use
+        self.arrays = ArrayKernels(self.module)
 
-        fmt_scan = "%d\0"
-        self.fmt_str_scan = ir.GlobalVariable(self.module, ir.ArrayType(ir.IntType(8), len(fmt_scan)), name="fmtstrscan")
-        self.fmt_str_scan.linkage = 'internal'
-        self.fmt_str_scan.global_constant = True
-        self.fmt_str_scan.initializer = ir.Constant(ir.ArrayType(ir.IntType(8), len(fmt_scan)),
-                                                    bytearray(fmt_scan.encode("utf8")))
+        # ids of heap arrays produced by an expression and not yet owned by
+        # a variable; they are freed as soon as they have been consumed
+        self.temporaries = set()
+
+        # Visitor cache: node type -> bound handler, so overrides in
+        # subclasses are picked up without walking an isinstance chain
+        self.handlers = {node_type: getattr(self, name) for node_type, name in NODE_HANDLERS.items()}
+
+    def string_constant(self, text):
+        ptr = self.strings.get(text)
+        if ptr is None:
+            data = bytearray(text.encode('utf8') + b'\0')
+            cstr = ir.Constant(ir.ArrayType(ir.IntType(8), len(data)), data)
+            # Private constants stay out of the object's symbol table, and
+            # short names keep the constant GEP at every use small
+            global_str = ir.GlobalVariable(self.module, cstr.type, name=f"s{len(self.strings)}")
+            global_str.linkage = 'private'
+            global_str.global_constant = True
+            global_str.initializer = cstr
+            zero = ir.Constant(ir.IntType(32), 0)
+            ptr = global_str.gep([zero, zero])
+            self.strings[text] = ptr
+        return ptr
+
+    def setup_runtime(self):
+        # Print and input() go through the buffered runtime in build.runtime,
+        # emitted into every module so the output links with nothing but libc
+        self.runtime = define_runtime(self.module)
 
     def print_int(self, val):
-        fmt_ptr = self.builder.bitcast(self.fmt_str_int, ir.IntType(8).as_pointer())
-        self.builder.call(self.printf, [fmt_ptr, val])
+        self.builder.call(self.runtime["chitii_put_int"], [val])
 
     def print_string(self, text):
-        cstr = ir.Constant(ir.ArrayType(ir.IntType(8), len(text) + 1), bytearray(text.encode('utf8') + b'\0'))
-        gv_name = f"str{len(self.module.global_values)}"
-        global_str = ir.GlobalVariable(self.module, cstr.type, name=gv_name)
-        global_str.linkage = 'internal'
-        global_str.global_constant = True
-        global_str.initializer = cstr
-
-        ptr = self.builder.bitcast(global_str, ir.IntType(8).as_pointer())
-        self.builder.call(self.printf, [ptr])
+        ptr = self.string_constant(text)
+        length = ir.Constant(ir.IntType(32), len(text.encode('utf8')))
+        self.builder.call(self.runtime["chitii_put_str"], [ptr, length])
+
+    def read_int(self):
+        return self.builder.call(self.runtime["chitii_get_int"], [])
+
+    def flush_output(self):
+        self.builder.call(self.runtime["chitii_flush"], [])
+
+    def emit_ret(self, val):
+        # Buffered output has to be written before main hands control back
+        if self.builder.function is self.main_func:
+            self.flush_output()
+        self.builder.ret(val)
+
+    def alloc_variable(self, name, ty=ir.IntType(32)):
+        ptr = self.builder.alloca(ty, name=name)
+        self.variables[name] = ptr
+        return ptr
+
+    def bind_array(self, name, arr_ptr):
+        self.variables[name] = arr_ptr
+        return arr_ptr
+
+    def find_variable(self, name):
+        return self.variables.get(name)
+
+    def lookup_variable(self, name):
+        ptr = self.find_variable(name)
+        if ptr is None:
+            raise Exception(f"Undefined variable {name}")
+        return ptr
+
+    def declare_function(self, name, func_type):
+        # User functions get their own namespace so they can't collide with
+        # main, the runtime or the libc functions it calls (write, read,
+        # malloc, free, ...)
+        func = ir.Function(self.module, func_type, name=f"fn.{name}")
+        func.linkage = 'internal'
+        self.functions[name] = func
+        return func
+
+    def lookup_function(self, name):
+        func = self.functions.get(name)
+        if func is None:
+            raise Exception(f"Undefined function {name}")
+        return func
 
     def generate(self, node):
         if isinstance(node, list):
             last_val = None
             for stmt in node:
                 last_val = self.generate(stmt)
+                self.release_temporary(last_val)
             if not self.builder.block.is_terminated:
-                self.builder.ret(ir.Constant(ir.IntType(32), 0))
+                self.emit_ret(ir.Constant(ir.IntType(32), 0))
             return last_val
 
-        if isinstance(node, Number):
-            return ir.Constant(ir.IntType(32), node.value)
-
-        elif isinstance(node, StringLiteral):
-            return node.value
-
-        elif isinstance(node, BinOp):
-            left = self.generate(node.left)
-            right = self.generate(node.right)
-            if node.op == "PLUS":
-                return self.builder.add(left, right, name="addtmp")
-            elif node.op == "MINUS":
-                return self.builder.sub(left, right, name="subtmp")
-            elif node.op == "TIMES":
-                return self.builder.mul(left, right, name="multmp")
-            elif node.op == "DIVIDE":
-                return self.builder.sdiv(left, right, name="divtmp")
-            else:
-                raise Exception(f"Unknown operator {node.op}")
+        handler = self.handlers.get(type(node))
+        if handler is None:
+            raise Exception(f"Unsupported AST node type {type(node)}")
+        return handler(node)
 
-        elif isinstance(node, ArrayLiteral):
-            elem_vals = [self.generate(e) for e in node.elements]
-            array_type = ir.ArrayType(ir.IntType(32), len(elem_vals))
-            arr_ptr = self.builder.alloca(array_type)
-            zero = ir.Constant(ir.IntType(32), 0)
-            for i, val in enumerate(elem_vals):
-                idx = ir.Constant(ir.IntType(32), i)
-                ptr = self.builder.gep(arr_ptr, [zero, idx])
-                self.builder.store(val, ptr)
-            return arr_ptr
-
-        elif isinstance(node, ArrayAccess):
-            arr_ptr = self.generate(node.array)
-            if not isinstance(arr_ptr.type, ir.PointerType):
-                temp_ptr = self.builder.alloca(arr_ptr.type)
-                self.builder.store(arr_ptr, temp_ptr)
-                arr_ptr = temp_ptr
-            idx_val = self.generate(node.index)
-            zero = ir.Constant(ir.IntType(32), 0)
-            elem_ptr = self.builder.gep(arr_ptr, [zero, idx_val])
-            return self.builder.load(elem_ptr)
-
-        elif isinstance(node, Assign):
-            if isinstance(node.value, ArrayLiteral):
-                val_ptr = self.generate(node.value)
-                self.variables[node.name] = val_ptr
-                return val_ptr
-            elif isinstance(node.name, ArrayAccess):
-                arr_ptr = self.variables.get(node.name.array.name)
-                if arr_ptr is None:
-                    raise Exception(f"Undefined variable {node.name.array.name}")
-                idx_val = self.generate(node.name.index)
-                zero = ir.Constant(ir.IntType(32), 0)
-                elem_ptr = self.builder.gep(arr_ptr, [zero, idx_val])
-                val = self.generate(node.value)
-                self.builder.store(val, elem_ptr)
-                return val
-            else:
-                val = self.generate(node.value)
-                ptr = self.builder.alloca(ir.IntType(32), name=node.name)
-                self.builder.store(val, ptr)
-                self.variables[node.name] = ptr
-                return val
-
-        elif isinstance(node, Var):
-            ptr = self.variables.get(node.name)
-            if ptr is None:
-                raise Exception(f"Undefined variable {node.name}")
-            return self.builder.load(ptr, name=node.name + "_load")
-
-        elif isinstance(node, FunctionDef):
-            func_type = ir.FunctionType(ir.IntType(32), [ir.IntType(32)] * len(node.params))
-            func = ir.Function(self.module, func_type, name=node.name)
-            self.functions[node.name] = func
-            block = func.append_basic_block(name="entry")
-            old_builder = self.builder
-            old_vars = self.variables.copy()
-            self.builder = ir.IRBuilder(block)
-            self.variables = {}
-            for i, arg in enumerate(func.args):
-                arg.name = node.params[i]
-                ptr = self.builder.alloca(ir.IntType(32), name=arg.name)
-                self.builder.store(arg, ptr)
-                self.variables[arg.name] = ptr
-            for stmt in node.body:
-                self.generate(stmt)
-            if not self.builder.block.is_terminated:
-                self.builder.ret(ir.Constant(ir.IntType(32), 0))
-            self.builder = old_builder
-            self.variables = old_vars
-            return func
-
-        elif isinstance(node, Return):
-            ret_val = self.generate(node.value)
-            self.print_int(ret_val)
-            self.builder.ret(ret_val)
-            return ret_val
-
-        elif isinstance(node, FunctionCall):
-            func = self.functions.get(node.name)
-            if func is None:
-                raise Exception(f"Undefined function {node.name}")
-            args = [self.generate(arg) for arg in node.args]
-            return self.builder.call(func, args, name="calltmp")
-
-        elif isinstance(node, Print):
-            if isinstance(node.value, StringLiteral):
-                self.print_string(node.value.value)
+    def gen_number(self, node):
+        return ir.Constant(ir.IntType(32), node.value)
+
+    def gen_string(self, node):
+        return node.value
+
+    def is_array(self, val):
+        ty = val.type
+        if isinstance(ty, ir.PointerType):
+            ty = ty.pointee
+        return ty == ARRAY_PTR.pointee or isinstance(ty, ir.ArrayType)
+
+    def array_view(self, val):
+        # Any array value -> (i32 length, i32* to the first element).
+        # Literal arrays have their length in the type; heap arrays carry it
+        # in their header.
+        zero = ir.Constant(ir.IntType(32), 0)
+        if val.type == ARRAY_PTR:
+            length = self.builder.load(self.builder.gep(val, [zero, zero]))
+            data = self.builder.gep(val, [zero, ir.Constant(ir.IntType(32), 1), zero])
+            return self.builder.trunc(length, ir.IntType(32)), data
+        if isinstance(val.type, ir.ArrayType):
+            temp_ptr = self.builder.alloca(val.type)
+            self.builder.store(val, temp_ptr)
+            val = temp_ptr
+        if isinstance(val.type, ir.PointerType) and isinstance(val.type.pointee, ir.ArrayType):
+            return ir.Constant(ir.IntType(32), val.type.pointee.count), self.builder.gep(val, [zero, zero])
+        raise Exception("Expected an array")
+
+    def new_array(self, length, zeroed=False):
+        i64 = ir.IntType(64)
+        count = self.builder.sext(length, i64)
+        size = self.builder.add(self.builder.mul(count, ir.Constant(i64, 4)), ir.Constant(i64, HEADER_SIZE))
+        raw = self.allocate(size, zeroed)
+        self.check_allocation(raw)
+        arr = self.builder.bitcast(raw, ARRAY_PTR)
+        zero = ir.Constant(ir.IntType(32), 0)
+        self.builder.store(count, self.builder.gep(arr, [zero, zero]))
+        self.temporaries.add(id(arr))
+        return arr
+
+    def allocate(self, size, zeroed):
+        if zeroed:
+            return self.builder.call(self.arrays.calloc(), [ir.Constant(size.type, 1), size])
+        return self.builder.call(self.arrays.malloc(), [size])
+
+    def free_array(self, arr):
+        self.builder.call(self.arrays.free(), [self.builder.bitcast(arr, ir.IntType(8).as_pointer())])
+
+    def release_temporary(self, val):
+        if id(val) in self.temporaries:
+            self.temporaries.discard(id(val))
+            self.free_array(val)
+
+    # Assigning a heap array copies it, so each one is owned by exactly one
+    # variable and is freed when that variable is overwritten or its
+    # function returns. Arrays owned by top-level variables live as long as
+    # the program (or REPL session) does.
+    def release_variable(self, name):
+        ptr = self.find_variable(name)
+        if ptr is not None and ptr.type.pointee == ARRAY_PTR:
+            self.free_array(self.builder.load(ptr))
+
+    def release_locals(self):
+        if self.builder.function is self.main_func:
+            return
+        for ptr in self.variables.values():
+            if ptr.type.pointee == ARRAY_PTR:
+                self.free_array(self.builder.load(ptr))
+
+    def array_binop(self, op, left, right):
+        # Element-wise over the shorter operand; a scalar side is broadcast
+        operands = (left, right)
+        left_is_array = self.is_array(left)
+        right_is_array = self.is_array(right)
+        if left_is_array:
+            left_len, left = self.array_view(left)
+        if right_is_array:
+            right_len, right = self.array_view(right)
+        if left_is_array and right_is_array:
+            shorter = self.builder.icmp_signed("<", left_len, right_len)
+            length = self.builder.select(shorter, left_len, right_len)
+        else:
+            length = left_len if left_is_array else right_len
+        if op == "DIVIDE":
+            self.check_division(left, right, length)
+        result = self.new_array(length)
+        _, out = self.array_view(result)
+        kernel = self.arrays.binop(op, left_is_array, right_is_array)
+        self.builder.call(kernel, [out, left, right, length])
+        for operand in operands:
+            self.release_temporary(operand)
+        return result
+
+    def gen_binop(self, node):
+        # Long expressions are deep left-leaning BinOp trees, so the tree is
+        # walked in post-order with an explicit stack instead of recursing
+        values = []
+        stack = [(node, False)]
+        while stack:
+            node, visited = stack.pop()
+            if visited:
+                right = values.pop()
+                left = values.pop()
+                values.append(self.emit_binop(node.op, left, right))
+            elif isinstance(node, BinOp):
+                stack.append((node, True))
+                stack.append((node.right, False))
+                stack.append((node.left, False))
             else:
-                val = self.generate(node.value)
-                self.print_int(val)
-            return None
+                values.append(self.generate(node))
+        return values[0]
+
+    def emit_binop(self, op, left, right):
+        if self.is_array(left) or self.is_array(right):
+            return self.array_binop(op, left, right)
+        if op == "PLUS":
+            return self.builder.add(left, right, name="addtmp")
+        elif op == "MINUS":
+            return self.builder.sub(left, right, name="subtmp")
+        elif op == "TIMES":
+            return self.builder.mul(left, right, name="multmp")
+        elif op == "DIVIDE":
+            self.check_division(left, right)
+            return self.builder.sdiv(left, right, name="divtmp")
+        else:
+            raise Exception(f"Unknown operator {op}")
+
+    def gen_array_literal(self, node):
+        elem_vals = [self.generate(e) for e in node.elements]
+        array_type = ir.ArrayType(ir.IntType(32), len(elem_vals))
+        arr_ptr = self.builder.alloca(array_type)
+        zero = ir.Constant(ir.IntType(32), 0)
+        for i, val in enumerate(elem_vals):
+            idx = ir.Constant(ir.IntType(32), i)
+            ptr = self.builder.gep(arr_ptr, [zero, idx])
+            self.builder.store(val, ptr)
+        return arr_ptr
 
-        elif isinstance(node, Input):
-            var_ptr = self.builder.alloca(ir.IntType(32))
-            fmt_ptr = self.builder.bitcast(self.fmt_str_scan, ir.IntType(8).as_pointer())
-            self.builder.call(self.scanf, [fmt_ptr, var_ptr])
-            return self.builder.load(var_ptr)
+    def gen_array_access(self, node):
+        arr_ptr = self.generate(node.array)
+        if not isinstance(arr_ptr.type, ir.PointerType):
+            temp_ptr = self.builder.alloca(arr_ptr.type)
+            self.builder.store(arr_ptr, temp_ptr)
+            arr_ptr = temp_ptr
+        idx_val = self.generate(node.index)
+        return self.builder.load(self.element_ptr(arr_ptr, idx_val))
 
+    def gen_assign(self, node):
+        if isinstance(node.value, ArrayLiteral):
+            val_ptr = self.generate(node.value)
+            self.release_variable(node.name)
+            return self.bind_array(node.name, val_ptr)
+        elif isinstance(node.name, ArrayAccess):
+            arr_ptr = self.lookup_variable(node.name.array.name)
+            idx_val = self.generate(node.name.index)
+            if arr_ptr.type.pointee == ARRAY_PTR:
+                arr_ptr = self.builder.load(arr_ptr)
+            elem_ptr = self.element_ptr(arr_ptr, idx_val)
+            val = self.generate(node.value)
+            self.builder.store(val, elem_ptr)
+            return val
         else:
-            raise Exception(f"Unsupported AST node type {type(node)}")
+            val = self.generate(node.value)
+            if isinstance(val.type, ir.PointerType) and isinstance(val.type.pointee, ir.ArrayType):
+                # fill() hands back a literal array's storage; assignment copies it
+                val = self.builder.load(val)
+            elif val.type == ARRAY_PTR and id(val) not in self.temporaries:
+                val = self.copy_array(val)
+            self.release_variable(node.name)
+            ptr = self.alloc_variable(node.name, val.type)
+            self.builder.store(val, ptr)
+            self.temporaries.discard(id(val))
+            return val
 
-    def finish(self):
+    def gen_var(self, node):
+        ptr = self.lookup_variable(node.name)
+        return self.builder.load(ptr, name=node.name + "_load")
+
+    def gen_function_def(self, node):
+        func_type = ir.FunctionType(ir.IntType(32), [ir.IntType(32)] * len(node.params))
+        func = self.declare_function(node.name, func_type)
+        block = func.append_basic_block(name="entry")
+        old_builder = self.builder
+        old_vars = self.variables.copy()
+        self.builder = ir.IRBuilder(block)
+        self.variables = {}
+        for i, arg in enumerate(func.args):
+            arg.name = node.params[i]
+            ptr = self.builder.alloca(ir.IntType(32), name=arg.name)
+            self.builder.store(arg, ptr)
+            self.variables[arg.name] = ptr
+        for stmt in node.body:
+            self.release_temporary(self.generate(stmt))
         if not self.builder.block.is_terminated:
+            self.release_locals()
             self.builder.ret(ir.Constant(ir.IntType(32), 0))
+        self.builder = old_builder
+        self.variables = old_vars
+        return func
+
+    def gen_return(self, node):
+        ret_val = self.generate(node.value)
+        self.print_int(ret_val)
+        self.release_locals()
+        self.emit_ret(ret_val)
+        return ret_val
+
+    def element_ptr(self, arr_ptr, idx_val):
+        self.check_index(arr_ptr, idx_val)
+        zero = ir.Constant(ir.IntType(32), 0)
+        if arr_ptr.type == ARRAY_PTR:
+            return self.builder.gep(arr_ptr, [zero, ir.Constant(ir.IntType(32), 1), idx_val])
+        return self.builder.gep(arr_ptr, [zero, idx_val])
+
+    # Runtime checks. Native executables behave like C and trap (or index
+    # out of bounds) on their own; code run inside another process
+    # overrides these to report an error instead.
+    def check_index(self, arr_ptr, idx_val):
+        pass
+
+    def check_division(self, left, right, length=None):
+        pass
+
+    def check_allocation(self, raw):
+        pass
+
+    def array_ref(self, node):
+        # Literal arrays in variables are used through their storage, so
+        # fill() writes the variable itself and reads don't copy it first
+        if isinstance(node, Var):
+            ptr = self.lookup_variable(node.name)
+            if isinstance(ptr.type.pointee, ir.ArrayType):
+                return ptr
+        return self.generate(node)
+
+    def gen_array_alloc(self, node):
+        size = self.generate(node.size)
+        zero = ir.Constant(ir.IntType(32), 0)
+        size = self.builder.select(self.builder.icmp_signed("<", size, zero), zero, size)
+        return self.new_array(size, zeroed=True)
+
+    def gen_array_length(self, node):
+        arr = self.array_ref(node.array)
+        length, _ = self.array_view(arr)
+        self.release_temporary(arr)
+        return length
+
+    def gen_array_reduce(self, node):
+        arr = self.array_ref(node.array)
+        length, data = self.array_view(arr)
+        result = self.builder.call(self.arrays.reduce(node.op), [data, length])
+        self.release_temporary(arr)
+        return result
+
+    def gen_array_fill(self, node):
+        arr = self.array_ref(node.array)
+        length, data = self.array_view(arr)
+        value = self.generate(node.value)
+        self.builder.call(self.arrays.fill(), [data, value, length])
+        return arr
+
+    def gen_array_copy(self, node):
+        arr = self.array_ref(node.array)
+        result = self.copy_array(arr)
+        self.release_temporary(arr)
+        return result
+
+    def copy_array(self, arr):
+        length, data = self.array_view(arr)
+        result = self.new_array(length)
+        _, out = self.array_view(result)
+        i8_ptr = ir.IntType(8).as_pointer()
+        size = self.builder.mul(self.builder.sext(length, ir.IntType(64)), ir.Constant(ir.IntType(64), 4))
+        self.builder.call(self.arrays.memcpy(), [self.builder.bitcast(out, i8_ptr), self.builder.bitcast(data, i8_ptr),
+                                                 size, ir.Constant(ir.IntType(1), 0)])
+        return result
+
+    def gen_function_call(self, node):
+        func = self.lookup_function(node.name)
+        args = [self.generate(arg) for arg in node.args]
+        return self.builder.call(func, args, name="calltmp")
+
+    def gen_print(self, node):
+        if isinstance(node.value, StringLiteral):
+            self.print_string(node.value.value)
+        else:
+            val = self.generate(node.value)
+            if self.is_array(val):
+                raise Exception("Cannot print an array; print its elements or sum() instead")
+            self.print_int(val)
+        return None
+
+    def gen_input(self, node):
+        return self.read_int()
+
+    def finish(self):
+        if not self.builder.block.is_terminated:
+            self.emit_ret(ir.Constant(ir.IntType(32), 0))
         return self.module
+
+class StdioCodeGen(CodeGen):
+    # The original lowering: one printf per printed value and one scanf per
+    # input(). Kept for comparison with the buffered runtime.
+    def setup_runtime(self):
+        voidptr_ty = ir.IntType(8).as_pointer()
+        printf_ty = ir.FunctionType(ir.IntType(32), [voidptr_ty], var_arg=True)
+        self.printf = ir.Function(self.module, printf_ty, name="printf")
+
+        scanf_ty = ir.FunctionType(ir.IntType(32), [voidptr_ty], var_arg=True)
+        self.scanf = ir.Function(self.module, scanf_ty, name="scanf")
+
+        self.fmt_str_int = self.string_constant("%d\n")
+        self.fmt_str_scan = self.string_constant("%d")
+
+    def print_int(self, val):
+        self.builder.call(self.printf, [self.fmt_str_int, val])
+
+    def print_string(self, text):
+        ptr = self.string_constant(text)
+        self.builder.call(self.printf, [ptr])
+
+    def read_int(self):
+        var_ptr = self.builder.alloca(ir.IntType(32))
+        self.builder.call(self.scanf, [self.fmt_str_scan, var_ptr])
+        return self.builder.load(var_ptr)
+
+    def flush_output(self):
+        pass
@@ -0,0 +1,154 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from llvmlite import binding
+from build.lexer import TokenStream
+from build.parser import Parser
+from build.codegen import CodeGen, initialize_llvm
+from build.cache import CompileCache
+from build.optimizer import OPT_LEVELS, optimize_ast, optimize_module
+
+# Builds many source files at once: each file is lexed, parsed, compiled
+# and emitted straight to an object file in a worker process. Files whose
+# content hash matches the manifest from the previous build are skipped.
+
+MANIFEST = ".chitii_build.json"
+
+_target_machine = None
+
+
+def _init_worker():
+    global _target_machine
+    initialize_llvm()
+    _target_machine = binding.Target.from_default_triple().create_target_machine(reloc="pic")
+
+
+def compile_file(source_path, object_path, opt_level=0):
+    if _target_machine is None:
+        _init_worker()
+    start = time.perf_counter()
+    with open(source_path, "r") as f:
+        source_code = f.read()
+
+    parser = Parser(TokenStream(source_code))
+    ast = optimize_ast(parser.parse(), opt_level)
+    codegen = CodeGen()
+    codegen.generate(ast)
+
+    # llvmlite can only hand a module to LLVM as text, but it never touches
+    # the disk; the object file is the only thing written.
+    mod = binding.parse_assembly(str(codegen.finish()))
+    mod.verify()
+    instructions = optimize_module(mod, opt_level, _target_machine)
+    with open(object_path, "wb") as f:
+        f.write(_target_machine.emit_object(mod))
+    return source_path, time.perf_counter() - start, instructions
+
+
+def object_path_for(source_path, out_dir):
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(out_dir, name + ".o")
+
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def plan(sources, out_dir, opt_level, manifest):
+    jobs = []
+    skipped = []
+    for source_path in sources:
+        with open(source_path, "r") as f:
+            digest = CompileCache.key(f.read(), opt_level, variant="object")
+        object_path = object_path_for(source_path, out_dir)
+        if manifest.get(os.path.abspath(source_path)) == digest and os.path.exists(object_path):
+            skipped.append(source_path)
+        else:
+            jobs.append((source_path, object_path, digest))
+    return jobs, skipped
+
+
+def build(sources, out_dir, jobs=None, opt_level=0, force=False):
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {} if force else load_manifest(out_dir)
+    pending, skipped = plan(sources, out_dir, opt_level, manifest)
+    digests = {source_path: digest for source_path, _, digest in pending}
+
+    results = []
+    errors = []
+    start = time.perf_counter()
+    if jobs == 1 or len(pending) <= 1:
+        for source_path, object_path, _ in pending:
+            try:
+                results.append(compile_file(source_path, object_path, opt_level))
+            except Exception as e:
+                errors.append((source_path, e))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as pool:
+            futures = {pool.submit(compile_file, source_path, object_path, opt_level): source_path
+                       for source_path, object_path, _ in pending}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    errors.append((futures[future], e))
+    wall = time.perf_counter() - start
+
+    for source_path, _, _ in results:
+        manifest[os.path.abspath(source_path)] = digests[source_path]
+    save_manifest(out_dir, manifest)
+    return results, skipped, errors, wall
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Compile source files to object files in parallel")
+    arg_parser.add_argument("sources", nargs="+", help="source files to compile")
+    arg_parser.add_argument("-o", "--out-dir", default="objects", help="directory for the object files")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    arg_parser.add_argument("-O", dest="opt_level", type=int, choices=OPT_LEVELS, default=0,
+                            help="optimization level (0-3)")
+    arg_parser.add_argument("--force", action="store_true", help="rebuild files even if they are unchanged")
+    arg_parser.add_argument("--compare-serial", action="store_true",
+                            help="afterwards, time a -j1 rebuild of the same files for comparison")
+    args = arg_parser.parse_args(argv)
+
+    names = [object_path_for(source_path, args.out_dir) for source_path in args.sources]
+    if len(set(names)) != len(names):
+        arg_parser.error("source files must have distinct names")
+
+    results, skipped, errors, wall = build(args.sources, args.out_dir, args.jobs, args.opt_level, args.force)
+
+    for source_path, elapsed, (before, after) in sorted(results):
+        print(f"Compiled {source_path} in {elapsed * 1000:.1f} ms ({before} -> {after} instructions)")
+    for source_path, e in errors:
+        print(f"Error in {source_path}: {e}", file=sys.stderr)
+
+    print(f"{len(results)} compiled, {len(skipped)} unchanged, {len(errors)} failed")
+    if results:
+        print(f"Wall-clock {wall:.2f}s")
+    if results and args.compare_serial:
+        # Rebuild exactly the files that were just compiled, in this
+        # process, so both timings cover the same work
+        compiled = [source_path for source_path, _, _ in results]
+        _, _, _, serial = build(compiled, args.out_dir, 1, args.opt_level, force=True)
+        print(f"Serial (-j1) {serial:.2f}s, speedup {serial / wall:.2f}x")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,7 @@
+import mmap
 import re
+from array import array
+from bisect import bisect_right
 
 TOKEN_SPECIFICATION = [
     ('COMMENT', r'#.*'),          # Comment from # to end of line
@@ -29,25 +32,150 @@ TOKEN_SPECIFICATION = [
 master_regex = '|'.join(f'(?P<{name}>{regex})' for name, regex in TOKEN_SPECIFICATION)
 get_token = re.compile(master_regex).match
 
+# Tokens are identified by their index in TOKEN_SPECIFICATION
+KIND_NAMES = [name for name, _ in TOKEN_SPECIFICATION]
+KIND_CODES = {name: code for code, name in enumerate(KIND_NAMES)}
+STRING = KIND_CODES['STRING']
+MISMATCH = KIND_CODES['MISMATCH']
+
+# Whitespace, newlines and comments are skipped inside the regex itself, so
+# every match is a real token whose group number is its kind code + 1. The
+# skip is possessive, so trivia is never handed back to a token (or to
+# MISMATCH), and trailing trivia matches as an empty end-of-input token;
+# that keeps the matches contiguous, so finditer never searches ahead.
+_IGNORED = {'COMMENT', 'SKIP', 'NEWLINE'}
+_TOKEN_PATTERN = '(?:[ \\t\\n]+|#.*)*+(?:' + '|'.join(
+    f'({regex})' for name, regex in TOKEN_SPECIFICATION if name not in _IGNORED) + '|\\Z)'
+_GROUP_KINDS = [None] + [KIND_CODES[name] for name in KIND_NAMES if name not in _IGNORED]
+_scan_str = re.compile(_TOKEN_PATTERN).finditer
+_scan_bytes = re.compile(_TOKEN_PATTERN.encode('ascii')).finditer
+
+
+def scan(source, pos=0):
+    scanner = _scan_str if isinstance(source, str) else _scan_bytes
+    group_kinds = _GROUP_KINDS
+    for match in scanner(source, pos):
+        group = match.lastindex
+        if group is None:
+            break
+        yield group_kinds[group], match.start(group), match.end(group)
+
+
+class TokenStream:
+    def __init__(self, source, chunk_size=4096):
+        self.source = source
+        self.is_text = isinstance(source, str)
+        self.chunk_size = chunk_size
+        self.scanner = scan(source)
+        self.kinds = array('B')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.base = 0        # index of the first token still held
+        self.exhausted = False
+        self.line_starts = None
+        self.cached_index = -1
+        self.cached_token = None
+
+    @classmethod
+    def from_file(cls, path, chunk_size=4096):
+        with open(path, 'rb') as f:
+            try:
+                source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty files cannot be mapped
+                source = b''
+        return cls(source, chunk_size)
+
+    def fill(self):
+        kinds, starts, ends = self.kinds, self.starts, self.ends
+        n = 0
+        for kind, start, end in self.scanner:
+            if kind == MISMATCH:
+                line, col = self.line_col(start)
+                raise SyntaxError(f'Unexpected token: {self.text(start, end)} at line {line}, column {col}')
+            kinds.append(kind)
+            starts.append(start)
+            ends.append(end)
+            n += 1
+            if n == self.chunk_size:
+                return True
+        self.exhausted = True
+        return n > 0
+
+    def ensure(self, index):
+        local = index - self.base
+        while local >= len(self.kinds):
+            if self.exhausted or not self.fill():
+                return False
+        return True
+
+    def text(self, start, end):
+        value = self.source[start:end]
+        return value if self.is_text else value.decode('utf8')
+
+    def kind(self, index):
+        if not self.ensure(index):
+            return None
+        return self.kinds[index - self.base]
+
+    def value(self, index):
+        local = index - self.base
+        kind = self.kinds[local]
+        start, end = self.starts[local], self.ends[local]
+        if kind == STRING:
+            start, end = start + 1, end - 1
+        return self.text(start, end)
+
+    def __getitem__(self, index):
+        # The parser peeks the same token several times in a row
+        if index == self.cached_index:
+            return self.cached_token
+        if index < self.base or not self.ensure(index):
+            raise IndexError(index)
+        token = (KIND_NAMES[self.kinds[index - self.base]], self.value(index))
+        self.cached_index = index
+        self.cached_token = token
+        return token
+
+    def release(self, index):
+        # Drop tokens the parser has finished with; trimming is batched so
+        # the arrays are only shifted once per chunk.
+        drop = index - self.base
+        if drop >= self.chunk_size:
+            del self.kinds[:drop]
+            del self.starts[:drop]
+            del self.ends[:drop]
+            self.base = index
+
+    def offset(self, index):
+        self.ensure(index)
+        return self.starts[index - self.base]
+
+    def position(self, index):
+        return self.line_col(self.offset(index))
+
+    def line_col(self, offset):
+        if self.line_starts is None:
+            newline = '\n' if self.is_text else b'\n'
+            self.line_starts = array('q', [0])
+            pos = self.source.find(newline)
+            while pos != -1:
+                self.line_starts.append(pos + 1)
+                pos = self.source.find(newline, pos + 1)
+        line = bisect_right(self.line_starts, offset)
+        return line, offset - self.line_starts[line - 1] + 1
+
+
 def tokenize(code):
-    pos = 0
     tokens = []
-    while pos < len(code):
-        match = get_token(code, pos)
-        if not match:
-            raise SyntaxError(f'Unexpected character: {code[pos]}')
-        kind = match.lastgroup
-        value = match.group(kind)
-        if kind == "COMMENT":
-            pos = match.end()
-            continue
-        if kind == "STRING":
-            value = value[1:-1]
-        if kind == "SKIP" or kind == "NEWLINE":
-            pos = match.end()
-            continue
-        if kind == "MISMATCH":
-            raise SyntaxError(f'Unexpected token: {value}')
-        tokens.append((kind, value))
-        pos = match.end()
+    for kind, start, end in scan(code):
+        if kind == MISMATCH:
+            line, col = TokenStream(code).line_col(start)
+            raise SyntaxError(f'Unexpected token: {code[start:end]} at line {line}, column {col}')
+        if kind == STRING:
+            start, end = start + 1, end - 1
+        tokens.append((KIND_NAMES[kind], code[start:end]))
     return tokens
+
+
+def tokenize_file(path):
+    return TokenStream.from_file(path)
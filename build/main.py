@@ -1,23 +1,45 @@
-from build.lexer import tokenize
+from build.lexer import TokenStream
 from build.parser import Parser
 from build.codegen import CodeGen
+from build.cache import default_cache, emit_entry
+from build.optimizer import OPT_LEVELS, optimize_ast
+from llvmlite import binding
+import argparse
 
-def main():
+def main(opt_level=0):
     # Read source code from file
     with open("program.txt", "r") as f:
         source_code = f.read()
 
-    # Tokenize source code
-    tokens = tokenize(source_code)
+    # Reuse the IR from an earlier build of the same source if we have it
+    cache = default_cache()
+    key = cache.key(source_code, opt_level)
+    entry = cache.get(key)
 
-    # Parse tokens into AST
-    parser = Parser(tokens)
-    ast = parser.parse()  # List of statements
+    if entry is None:
+        # Tokenize source code lazily as the parser asks for tokens
+        tokens = TokenStream(source_code)
 
-    # Generate LLVM IR from AST
-    codegen = CodeGen()
-    codegen.generate(ast)
-    llvm_ir = codegen.finish()
+        # Parse tokens into AST
+        parser = Parser(tokens)
+        ast = parser.parse()  # List of statements
+
+        # Fold constants and drop dead assignments before codegen
+        ast = optimize_ast(ast, opt_level)
+
+        # Generate LLVM IR from AST
+        codegen = CodeGen()
+        codegen.generate(ast)
+        llvm_ir = codegen.finish()
+
+        target_machine = binding.Target.from_default_triple().create_target_machine()
+        entry = emit_entry(llvm_ir, target_machine, opt_level=opt_level)
+        cache.put(key, entry)
+        print("Cache miss: compiled program.txt")
+    else:
+        print("Cache hit: reused IR for program.txt")
+
+    llvm_ir = entry.llvm_ir
 
     # Print LLVM IR (optional)
     print(str(llvm_ir))
@@ -26,7 +48,13 @@ def main():
     with open("program.ll", "w") as f:
         f.write(str(llvm_ir))
 
+    before, after = entry.instructions
+    print(f"-O{opt_level}: {before} instructions before optimization, {after} after")
     print("LLVM IR generated and saved to program.ll")
 
 if __name__ == "__main__":
-    main()
+    arg_parser = argparse.ArgumentParser(description="Compile program.txt to program.ll")
+    arg_parser.add_argument("-O", dest="opt_level", type=int, choices=OPT_LEVELS, default=0,
+                            help="optimization level (0-3)")
+    args = arg_parser.parse_args()
+    main(args.opt_level)
@@ -1,27 +1,42 @@
 class ASTNode:
-    pass
+    __slots__ = ()
 
 class Number(ASTNode):
+    __slots__ = ("value",)
     def __init__(self, value):
         self.value = value
     def __repr__(self):
         return f"Number({self.value})"
 
 class StringLiteral(ASTNode):
+    __slots__ = ("value",)
     def __init__(self, value):
         self.value = value
     def __repr__(self):
         return f'StringLiteral("{self.value}")'
 
 class BinOp(ASTNode):
+    __slots__ = ("left", "op", "right")
     def __init__(self, left, op, right):
         self.left = left
         self.op = op
         self.right = right
     def __repr__(self):
-        return f"BinOp({self.left}, '{self.op}', {self.right})"
+        # Built with an explicit stack so long operator chains don't recurse
+        parts = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                parts.append(node)
+            elif isinstance(node, BinOp):
+                stack.extend((")", node.right, f", '{node.op}', ", node.left, "BinOp("))
+            else:
+                parts.append(repr(node))
+        return "".join(parts)
 
 class Assign(ASTNode):
+    __slots__ = ("name", "value")
     def __init__(self, name, value):
         self.name = name
         self.value = value
@@ -29,12 +44,14 @@ class Assign(ASTNode):
         return f"Assign({self.name}, {self.value})"
 
 class Var(ASTNode):
+    __slots__ = ("name",)
     def __init__(self, name):
         self.name = name
     def __repr__(self):
         return f"Var({self.name})"
 
 class FunctionDef(ASTNode):
+    __slots__ = ("name", "params", "body")
     def __init__(self, name, params, body):
         self.name = name
         self.params = params
@@ -43,6 +60,7 @@ class FunctionDef(ASTNode):
         return f"FunctionDef({self.name}, params={self.params}, body={self.body})"
 
 class FunctionCall(ASTNode):
+    __slots__ = ("name", "args")
     def __init__(self, name, args):
         self.name = name
         self.args = args
@@ -50,30 +68,72 @@ class FunctionCall(ASTNode):
         return f"FunctionCall({self.name}, args={self.args})"
 
 class Return(ASTNode):
+    __slots__ = ("value",)
     def __init__(self, value):
         self.value = value
     def __repr__(self):
         return f"Return({self.value})"
 
 class Print(ASTNode):
+    __slots__ = ("value",)
     def __init__(self, value):
         self.value = value
     def __repr__(self):
         return f"Print({self.value})"
 
 class Input(ASTNode):
+    __slots__ = ()
     def __repr__(self):
         return "Input()"
 
 class ArrayLiteral(ASTNode):
+    __slots__ = ("elements",)
     def __init__(self, elements):
         self.elements = elements
     def __repr__(self):
         return f"ArrayLiteral({self.elements})"
 
 class ArrayAccess(ASTNode):
+    __slots__ = ("array", "index")
     def __init__(self, array, index):
         self.array = array
         self.index = index
     def __repr__(self):
         return f"ArrayAccess({self.array}, {self.index})"
+
+class ArrayAlloc(ASTNode):
+    __slots__ = ("size",)
+    def __init__(self, size):
+        self.size = size
+    def __repr__(self):
+        return f"ArrayAlloc({self.size})"
+
+class ArrayLength(ASTNode):
+    __slots__ = ("array",)
+    def __init__(self, array):
+        self.array = array
+    def __repr__(self):
+        return f"ArrayLength({self.array})"
+
+class ArrayReduce(ASTNode):
+    __slots__ = ("op", "array")
+    def __init__(self, op, array):
+        self.op = op
+        self.array = array
+    def __repr__(self):
+        return f"ArrayReduce({self.op}, {self.array})"
+
+class ArrayFill(ASTNode):
+    __slots__ = ("array", "value")
+    def __init__(self, array, value):
+        self.array = array
+        self.value = value
+    def __repr__(self):
+        return f"ArrayFill({self.array}, {self.value})"
+
+class ArrayCopy(ASTNode):
+    __slots__ = ("array",)
+    def __init__(self, array):
+        self.array = array
+    def __repr__(self):
+        return f"ArrayCopy({self.array})"
@@ -0,0 +1,236 @@
+from llvmlite import binding
+from build.my_ast import Number, BinOp, Assign, Var, FunctionDef, FunctionCall, Return, Print, Input, ArrayLiteral, ArrayAccess
+from build.my_ast import ArrayAlloc, ArrayLength, ArrayReduce, ArrayFill, ArrayCopy
+
+OPT_LEVELS = (0, 1, 2, 3)
+
+# -O1 folds and propagates constants in the AST, -O2 also drops dead
+# assignments, and every level above 0 runs LLVM's pipeline at that speed
+# level (SROA/mem2reg, instcombine, GVN and the inliner from -O2 on).
+
+
+def _wrap_i32(value):
+    value &= 0xFFFFFFFF
+    return value - 0x100000000 if value & 0x80000000 else value
+
+
+def _fold_binop(op, left, right):
+    if op == "PLUS":
+        return _wrap_i32(left + right)
+    elif op == "MINUS":
+        return _wrap_i32(left - right)
+    elif op == "TIMES":
+        return _wrap_i32(left * right)
+    elif op == "DIVIDE":
+        if right == 0:
+            return None
+        # sdiv truncates toward zero, Python's // floors
+        quotient = abs(left) // abs(right)
+        return _wrap_i32(quotient if (left < 0) == (right < 0) else -quotient)
+    return None
+
+
+def binop_leaves(node):
+    # Operands of a BinOp tree, left to right. Long generated expressions
+    # make these trees thousands of levels deep, so they are walked with an
+    # explicit stack rather than by recursion.
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, BinOp):
+            stack.append(node.right)
+            stack.append(node.left)
+        else:
+            yield node
+
+
+def fold_binop(node, env):
+    values = []
+    stack = [(node, False)]
+    while stack:
+        node, visited = stack.pop()
+        if visited:
+            right = values.pop()
+            left = values.pop()
+            value = None
+            if isinstance(left, Number) and isinstance(right, Number):
+                value = _fold_binop(node.op, left.value, right.value)
+            values.append(BinOp(left, node.op, right) if value is None else Number(value))
+        elif isinstance(node, BinOp):
+            stack.append((node, True))
+            stack.append((node.right, False))
+            stack.append((node.left, False))
+        else:
+            values.append(fold_expr(node, env))
+    return values[0]
+
+
+def fold_expr(node, env):
+    if isinstance(node, Number):
+        return Number(int(node.value))
+
+    elif isinstance(node, Var):
+        if node.name in env:
+            return Number(env[node.name])
+        return node
+
+    elif isinstance(node, BinOp):
+        return fold_binop(node, env)
+
+    elif isinstance(node, FunctionCall):
+        return FunctionCall(node.name, [fold_expr(arg, env) for arg in node.args])
+
+    elif isinstance(node, ArrayLiteral):
+        return ArrayLiteral([fold_expr(e, env) for e in node.elements])
+
+    elif isinstance(node, ArrayAccess):
+        return ArrayAccess(node.array, fold_expr(node.index, env))
+
+    elif isinstance(node, ArrayAlloc):
+        return ArrayAlloc(fold_expr(node.size, env))
+
+    elif isinstance(node, ArrayLength):
+        return ArrayLength(fold_expr(node.array, env))
+
+    elif isinstance(node, ArrayReduce):
+        return ArrayReduce(node.op, fold_expr(node.array, env))
+
+    elif isinstance(node, ArrayFill):
+        return ArrayFill(fold_expr(node.array, env), fold_expr(node.value, env))
+
+    elif isinstance(node, ArrayCopy):
+        return ArrayCopy(fold_expr(node.array, env))
+
+    return node
+
+
+def fold_statement(stmt, env):
+    if isinstance(stmt, list):
+        return [fold_statement(s, env) for s in stmt]
+
+    elif isinstance(stmt, Assign):
+        if isinstance(stmt.name, ArrayAccess):
+            target = ArrayAccess(stmt.name.array, fold_expr(stmt.name.index, env))
+            return Assign(target, fold_expr(stmt.value, env))
+        value = fold_expr(stmt.value, env)
+        if isinstance(value, Number):
+            env[stmt.name] = value.value
+        else:
+            env.pop(stmt.name, None)
+        return Assign(stmt.name, value)
+
+    elif isinstance(stmt, FunctionDef):
+        # Function bodies only see their own parameters and locals
+        return FunctionDef(stmt.name, stmt.params, [fold_statement(s, {}) for s in stmt.body])
+
+    elif isinstance(stmt, Print):
+        return Print(fold_expr(stmt.value, env))
+
+    elif isinstance(stmt, Return):
+        return Return(fold_expr(stmt.value, env))
+
+    return fold_expr(stmt, env)
+
+
+def has_side_effects(node):
+    # Calls print their return value, input() consumes stdin and fill()
+    # writes to its array in place
+    if isinstance(node, (FunctionCall, Input, ArrayFill)):
+        return True
+    elif isinstance(node, BinOp):
+        return any(has_side_effects(leaf) for leaf in binop_leaves(node))
+    elif isinstance(node, ArrayLiteral):
+        return any(has_side_effects(e) for e in node.elements)
+    elif isinstance(node, ArrayAccess):
+        return has_side_effects(node.index)
+    elif isinstance(node, ArrayAlloc):
+        return has_side_effects(node.size)
+    elif isinstance(node, (ArrayLength, ArrayReduce, ArrayCopy)):
+        return has_side_effects(node.array)
+    return False
+
+
+def names_read(node, names):
+    if isinstance(node, list):
+        for stmt in node:
+            names_read(stmt, names)
+    elif isinstance(node, Var):
+        names.add(node.name)
+    elif isinstance(node, BinOp):
+        for leaf in binop_leaves(node):
+            names_read(leaf, names)
+    elif isinstance(node, FunctionCall):
+        names_read(node.args, names)
+    elif isinstance(node, ArrayLiteral):
+        names_read(node.elements, names)
+    elif isinstance(node, ArrayAccess):
+        names_read(node.array, names)
+        names_read(node.index, names)
+    elif isinstance(node, ArrayAlloc):
+        names_read(node.size, names)
+    elif isinstance(node, (ArrayLength, ArrayReduce, ArrayCopy)):
+        names_read(node.array, names)
+    elif isinstance(node, ArrayFill):
+        names_read(node.array, names)
+        names_read(node.value, names)
+    elif isinstance(node, Assign):
+        if isinstance(node.name, ArrayAccess):
+            names_read(node.name, names)
+        names_read(node.value, names)
+    elif isinstance(node, (Print, Return)):
+        names_read(node.value, names)
+    return names
+
+
+def remove_dead_assignments(statements, live_out=()):
+    live = set(live_out)
+    kept = []
+    for stmt in reversed(statements):
+        if isinstance(stmt, Assign) and isinstance(stmt.name, str):
+            if stmt.name not in live and not has_side_effects(stmt.value):
+                continue
+            live.discard(stmt.name)
+            names_read(stmt.value, live)
+        elif isinstance(stmt, FunctionDef):
+            stmt = FunctionDef(stmt.name, stmt.params, remove_dead_assignments(stmt.body))
+        else:
+            names_read(stmt, live)
+        kept.append(stmt)
+    kept.reverse()
+    return kept
+
+
+def assigned_names(statements):
+    names = set()
+    for stmt in statements:
+        if isinstance(stmt, list):
+            names |= assigned_names(stmt)
+        elif isinstance(stmt, Assign) and isinstance(stmt.name, str):
+            names.add(stmt.name)
+    return names
+
+
+def optimize_ast(ast, opt_level, keep_globals=False):
+    if opt_level < 1:
+        return ast
+    ast = fold_statement(ast, {})
+    if opt_level >= 2:
+        # A REPL session reads top-level variables on later lines, so they
+        # all stay live at the end of the program there.
+        live_out = assigned_names(ast) if keep_globals else ()
+        ast = remove_dead_assignments(ast, live_out)
+    return ast
+
+
+def count_instructions(mod):
+    return sum(len(list(block.instructions)) for func in mod.functions for block in func.blocks)
+
+
+def optimize_module(mod, opt_level, target_machine):
+    before = count_instructions(mod)
+    if opt_level > 0:
+        pto = binding.create_pipeline_tuning_options(speed_level=opt_level, size_level=0)
+        pass_builder = binding.create_pass_builder(target_machine, pto)
+        pass_manager = pass_builder.getModulePassManager()
+        pass_manager.run(mod, pass_builder)
+    return before, count_instructions(mod)
@@ -1,12 +1,34 @@
 from build.my_ast import Number, BinOp, Assign, Var, FunctionDef, FunctionCall, Return, Print, Input, StringLiteral, ArrayLiteral, ArrayAccess
+from build.my_ast import ArrayAlloc, ArrayLength, ArrayReduce, ArrayFill, ArrayCopy
+
+BINARY_PRECEDENCE = {"PLUS": 1, "MINUS": 1, "TIMES": 2, "DIVIDE": 2}
+
+# Array builtins: name -> (argument count, node constructor). A function
+# the program defines under the same name takes precedence.
+ARRAY_BUILTINS = {
+    "array": (1, ArrayAlloc),
+    "len": (1, ArrayLength),
+    "sum": (1, lambda array: ArrayReduce("sum", array)),
+    "min": (1, lambda array: ArrayReduce("min", array)),
+    "max": (1, lambda array: ArrayReduce("max", array)),
+    "fill": (2, ArrayFill),
+    "copy": (1, ArrayCopy),
+}
 
 class Parser:
-    def __init__(self, tokens):
+    def __init__(self, tokens, functions=()):
+        # tokens is a list of (kind, value) pairs or a lazily filled TokenStream;
+        # functions names any user functions defined before this source
         self.tokens = tokens
+        self.functions = set(functions)
         self.pos = 0
+        self.release = getattr(tokens, "release", None)
 
-    def peek(self):
-        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+    def peek(self, offset=0):
+        try:
+            return self.tokens[self.pos + offset]
+        except IndexError:
+            return None
 
     def consume(self, expected_type=None):
         token = self.peek()
@@ -46,8 +68,8 @@ class Parser:
             return statements
 
         elif tok[0] == "ID":
-            if self.pos + 1 < len(self.tokens):
-                next_tok = self.tokens[self.pos + 1]
+            next_tok = self.peek(1)
+            if next_tok is not None:
 
                 if next_tok[0] == "ASSIGN":
                     name = self.consume("ID")[1]
@@ -87,11 +109,14 @@ class Parser:
                 statements.extend(stmt)
             else:
                 statements.append(stmt)
+            if self.release:
+                self.release(self.pos)
         return statements
 
     def parse_function(self):
         self.consume("FUNC")
         name = self.consume("ID")[1]
+        self.functions.add(name)
         self.consume("LPAREN")
         params = []
         if self.peek() and self.peek()[0] != "RPAREN":
@@ -112,23 +137,54 @@ class Parser:
         return Return(value)
 
     def expr(self):
-        node = self.term()
-        while self.peek() and self.peek()[0] in ("PLUS", "MINUS"):
-            op = self.consume()[0]
-            right = self.term()
-            node = BinOp(node, op, right)
-        return node
-
-    def term(self):
-        node = self.factor()
-        while self.peek() and self.peek()[0] in ("TIMES", "DIVIDE"):
-            op = self.consume()[0]
-            right = self.factor()
-            node = BinOp(node, op, right)
-        return node
+        # Operator precedence parsing with explicit operand/operator stacks,
+        # so neither long operator chains nor deeply nested parentheses
+        # recurse in Python.
+        operands = []
+        operators = []
+        depth = 0
+        while True:
+            token = self.peek()
+            while token is not None and token[0] == "LPAREN":
+                self.pos += 1
+                operators.append("LPAREN")
+                depth += 1
+                token = self.peek()
+            operands.append(self.factor())
+
+            token = self.peek()
+            while depth and token is not None and token[0] == "RPAREN":
+                self.pos += 1
+                op = operators.pop()
+                while op != "LPAREN":
+                    right = operands.pop()
+                    operands[-1] = BinOp(operands[-1], op, right)
+                    op = operators.pop()
+                depth -= 1
+                token = self.peek()
+
+            prec = BINARY_PRECEDENCE.get(token[0]) if token is not None else None
+            if prec is None:
+                break
+            self.pos += 1
+            while operators and operators[-1] != "LPAREN" and BINARY_PRECEDENCE[operators[-1]] >= prec:
+                right = operands.pop()
+                operands[-1] = BinOp(operands[-1], operators.pop(), right)
+            operators.append(token[0])
+
+        while operators:
+            op = operators.pop()
+            if op == "LPAREN":
+                self.consume("RPAREN")
+                continue
+            right = operands.pop()
+            operands[-1] = BinOp(operands[-1], op, right)
+        return operands[0]
 
     def factor(self):
         token = self.peek()
+        if token is None:
+            raise SyntaxError("Unexpected end of input")
 
         if token[0] == "NUMBER":
             self.consume("NUMBER")
@@ -161,14 +217,12 @@ class Parser:
                 self.consume("RPAREN")
                 return Input()
             elif self.peek() and self.peek()[0] == "LPAREN":
-                self.consume("LPAREN")
-                args = []
-                if self.peek() and self.peek()[0] != "RPAREN":
-                    args.append(self.expr())
-                    while self.peek() and self.peek()[0] == "COMMA":
-                        self.consume("COMMA")
-                        args.append(self.expr())
-                self.consume("RPAREN")
+                args = self.call_args()
+                if name in ARRAY_BUILTINS and name not in self.functions:
+                    arity, make_node = ARRAY_BUILTINS[name]
+                    if len(args) != arity:
+                        raise SyntaxError(f"{name}() takes {arity} argument(s), got {len(args)}")
+                    return make_node(*args)
                 return FunctionCall(name, args)
             else:
                 return Var(name)
@@ -181,3 +235,14 @@ class Parser:
 
         else:
             raise SyntaxError(f"Unexpected token: {token}")
+
+    def call_args(self):
+        self.consume("LPAREN")
+        args = []
+        if self.peek() and self.peek()[0] != "RPAREN":
+            args.append(self.expr())
+            while self.peek() and self.peek()[0] == "COMMA":
+                self.consume("COMMA")
+                args.append(self.expr())
+        self.consume("RPAREN")
+        return args
@@ -0,0 +1,296 @@
+from llvmlite import ir
+
+# Buffered I/O runtime for generated programs. Output is collected in a
+# buffer and written with a single write(2) when it fills up or the program
+# returns from main; input is read in large blocks and integers are parsed
+# out of the buffer, so neither direction goes through printf/scanf.
+
+BUFFER_SIZE = 1 << 16
+MAX_INT_CHARS = 12  # "-2147483648\n"
+
+i8 = ir.IntType(8)
+i32 = ir.IntType(32)
+i64 = ir.IntType(64)
+i8_ptr = i8.as_pointer()
+void = ir.VoidType()
+
+RUNTIME_FUNCTIONS = {
+    "chitii_put_int": ir.FunctionType(void, [i32]),
+    "chitii_put_str": ir.FunctionType(void, [i8_ptr, i32]),
+    "chitii_get_int": ir.FunctionType(i32, []),
+    "chitii_flush": ir.FunctionType(void, []),
+}
+
+
+def declare_runtime(module):
+    return {name: ir.Function(module, func_type, name=name) for name, func_type in RUNTIME_FUNCTIONS.items()}
+
+
+def _const(ty, value):
+    return ir.Constant(ty, value)
+
+
+def _buffer(module, name):
+    buf_type = ir.ArrayType(i8, BUFFER_SIZE)
+    gv = ir.GlobalVariable(module, buf_type, name=name)
+    gv.linkage = 'internal'
+    gv.initializer = ir.Constant(buf_type, None)
+    return gv
+
+
+def _counter(module, name):
+    gv = ir.GlobalVariable(module, i32, name=name)
+    gv.linkage = 'internal'
+    gv.initializer = _const(i32, 0)
+    return gv
+
+
+def _memcpy(module):
+    return module.declare_intrinsic('llvm.memcpy', [i8_ptr, i8_ptr, i32])
+
+
+class RuntimeBuilder:
+    def __init__(self, module, linkage):
+        self.module = module
+        self.funcs = {}
+        for name, func_type in RUNTIME_FUNCTIONS.items():
+            func = ir.Function(module, func_type, name=name)
+            func.linkage = linkage
+            self.funcs[name] = func
+
+        sys_ty = ir.FunctionType(i64, [i32, i8_ptr, i64])
+        self.write = self._libc("write", sys_ty)
+        self.read = self._libc("read", sys_ty)
+        self.memcpy = _memcpy(module)
+
+        self.out_buf = _buffer(module, "chitii.outbuf")
+        self.out_len = _counter(module, "chitii.outlen")
+        self.in_buf = _buffer(module, "chitii.inbuf")
+        self.in_pos = _counter(module, "chitii.inpos")
+        self.in_len = _counter(module, "chitii.inlen")
+
+        self.fill_input = ir.Function(module, ir.FunctionType(i32, []), name="chitii.fill")
+        self.fill_input.linkage = 'internal'
+
+    def _libc(self, name, func_type):
+        try:
+            return self.module.get_global(name)
+        except KeyError:
+            return ir.Function(self.module, func_type, name=name)
+
+    def _out_ptr(self, builder, offset):
+        return builder.gep(self.out_buf, [_const(i32, 0), offset])
+
+    def build(self):
+        self.build_flush()
+        self.build_put_str()
+        self.build_put_int()
+        self.build_fill_input()
+        self.build_get_int()
+        return self.funcs
+
+    def build_flush(self):
+        func = self.funcs["chitii_flush"]
+        builder = ir.IRBuilder(func.append_basic_block("entry"))
+        do_write = func.append_basic_block("write")
+        done = func.append_basic_block("done")
+        length = builder.load(self.out_len)
+        builder.cbranch(builder.icmp_signed(">", length, _const(i32, 0)), do_write, done)
+
+        builder.position_at_end(do_write)
+        buf = self._out_ptr(builder, _const(i32, 0))
+        builder.call(self.write, [_const(i32, 1), buf, builder.sext(length, i64)])
+        builder.store(_const(i32, 0), self.out_len)
+        builder.branch(done)
+
+        builder.position_at_end(done)
+        builder.ret_void()
+
+    def build_put_str(self):
+        func = self.funcs["chitii_put_str"]
+        text, length = func.args
+        builder = ir.IRBuilder(func.append_basic_block("entry"))
+        flush = func.append_basic_block("flush")
+        direct = func.append_basic_block("direct")
+        copy = func.append_basic_block("copy")
+
+        used = builder.load(self.out_len)
+        fits = builder.icmp_signed("<=", builder.add(used, length), _const(i32, BUFFER_SIZE))
+        builder.cbranch(fits, copy, flush)
+
+        builder.position_at_end(flush)
+        builder.call(self.funcs["chitii_flush"], [])
+        too_big = builder.icmp_signed(">", length, _const(i32, BUFFER_SIZE))
+        builder.cbranch(too_big, direct, copy)
+
+        builder.position_at_end(direct)
+        builder.call(self.write, [_const(i32, 1), text, builder.sext(length, i64)])
+        builder.ret_void()
+
+        builder.position_at_end(copy)
+        used = builder.load(self.out_len)
+        builder.call(self.memcpy, [self._out_ptr(builder, used), text, length, _const(ir.IntType(1), 0)])
+        builder.store(builder.add(used, length), self.out_len)
+        builder.ret_void()
+
+    def build_put_int(self):
+        func = self.funcs["chitii_put_int"]
+        value = func.args[0]
+        builder = ir.IRBuilder(func.append_basic_block("entry"))
+        flush = func.append_basic_block("flush")
+        convert = func.append_basic_block("convert")
+        digits = func.append_basic_block("digits")
+        sign = func.append_basic_block("sign")
+        copy = func.append_basic_block("copy")
+
+        used = builder.load(self.out_len)
+        fits = builder.icmp_signed("<=", used, _const(i32, BUFFER_SIZE - MAX_INT_CHARS))
+        builder.cbranch(fits, convert, flush)
+
+        builder.position_at_end(flush)
+        builder.call(self.funcs["chitii_flush"], [])
+        builder.branch(convert)
+
+        # Digits are produced backwards into a scratch buffer; working in
+        # i64 keeps INT_MIN's magnitude representable.
+        builder.position_at_end(convert)
+        tmp_type = ir.ArrayType(i8, MAX_INT_CHARS)
+        tmp = builder.alloca(tmp_type)
+        wide = builder.sext(value, i64)
+        negative = builder.icmp_signed("<", wide, _const(i64, 0))
+        magnitude = builder.select(negative, builder.neg(wide), wide)
+        last = _const(i32, MAX_INT_CHARS - 1)
+        builder.store(_const(i8, ord("\n")), builder.gep(tmp, [_const(i32, 0), last]))
+        builder.branch(digits)
+
+        builder.position_at_end(digits)
+        pos = builder.phi(i32)
+        rest = builder.phi(i64)
+        pos.add_incoming(last, convert)
+        rest.add_incoming(magnitude, convert)
+        new_pos = builder.sub(pos, _const(i32, 1))
+        digit = builder.trunc(builder.urem(rest, _const(i64, 10)), i8)
+        builder.store(builder.add(digit, _const(i8, ord("0"))), builder.gep(tmp, [_const(i32, 0), new_pos]))
+        new_rest = builder.udiv(rest, _const(i64, 10))
+        pos.add_incoming(new_pos, digits)
+        rest.add_incoming(new_rest, digits)
+        builder.cbranch(builder.icmp_unsigned("!=", new_rest, _const(i64, 0)), digits, sign)
+
+        builder.position_at_end(sign)
+        minus_pos = builder.sub(new_pos, _const(i32, 1))
+        builder.store(_const(i8, ord("-")), builder.gep(tmp, [_const(i32, 0), minus_pos]))
+        start = builder.select(negative, minus_pos, new_pos)
+        builder.branch(copy)
+
+        builder.position_at_end(copy)
+        length = builder.sub(_const(i32, MAX_INT_CHARS), start)
+        used = builder.load(self.out_len)
+        src = builder.gep(tmp, [_const(i32, 0), start])
+        builder.call(self.memcpy, [self._out_ptr(builder, used), src, length, _const(ir.IntType(1), 0)])
+        builder.store(builder.add(used, length), self.out_len)
+        builder.ret_void()
+
+    def build_fill_input(self):
+        # Prompts written so far must be visible before we block on stdin
+        func = self.fill_input
+        builder = ir.IRBuilder(func.append_basic_block("entry"))
+        builder.call(self.funcs["chitii_flush"], [])
+        buf = builder.gep(self.in_buf, [_const(i32, 0), _const(i32, 0)])
+        got = builder.trunc(builder.call(self.read, [_const(i32, 0), buf, _const(i64, BUFFER_SIZE)]), i32)
+        got = builder.select(builder.icmp_signed(">", got, _const(i32, 0)), got, _const(i32, 0))
+        builder.store(_const(i32, 0), self.in_pos)
+        builder.store(got, self.in_len)
+        builder.ret(got)
+
+    def _peek(self, builder, func, name):
+        # Returns the next input byte as i32, or -1 once stdin is exhausted
+        have = func.append_basic_block(f"{name}.have")
+        refill = func.append_basic_block(f"{name}.refill")
+        done = func.append_basic_block(f"{name}.done")
+        start = builder.block
+
+        pos = builder.load(self.in_pos)
+        length = builder.load(self.in_len)
+        builder.cbranch(builder.icmp_signed("<", pos, length), have, refill)
+
+        builder.position_at_end(refill)
+        got = builder.call(self.fill_input, [])
+        builder.cbranch(builder.icmp_signed(">", got, _const(i32, 0)), have, done)
+
+        builder.position_at_end(have)
+        idx = builder.phi(i32)
+        idx.add_incoming(pos, start)
+        idx.add_incoming(_const(i32, 0), refill)
+        byte = builder.load(builder.gep(self.in_buf, [_const(i32, 0), idx]))
+        char = builder.zext(byte, i32)
+        builder.branch(done)
+
+        builder.position_at_end(done)
+        result = builder.phi(i32)
+        result.add_incoming(char, have)
+        result.add_incoming(_const(i32, -1), refill)
+        return result
+
+    def _advance(self, builder):
+        builder.store(builder.add(builder.load(self.in_pos), _const(i32, 1)), self.in_pos)
+
+    def build_get_int(self):
+        func = self.funcs["chitii_get_int"]
+        builder = ir.IRBuilder(func.append_basic_block("entry"))
+        skip = func.append_basic_block("skip")
+        skip_next = func.append_basic_block("skip.next")
+        signed = func.append_basic_block("signed")
+        take_sign = func.append_basic_block("take_sign")
+        digits = func.append_basic_block("digits")
+        digit = func.append_basic_block("digit")
+        done = func.append_basic_block("done")
+        builder.branch(skip)
+
+        # scanf("%d") skips any leading whitespace
+        builder.position_at_end(skip)
+        char = self._peek(builder, func, "skip")
+        is_space = builder.or_(builder.icmp_signed("==", char, _const(i32, ord(" "))),
+                               builder.icmp_unsigned("<=", builder.sub(char, _const(i32, 9)), _const(i32, 4)))
+        builder.cbranch(is_space, skip_next, signed)
+
+        builder.position_at_end(skip_next)
+        self._advance(builder)
+        builder.branch(skip)
+
+        builder.position_at_end(signed)
+        negative = builder.icmp_signed("==", char, _const(i32, ord("-")))
+        has_sign = builder.or_(negative, builder.icmp_signed("==", char, _const(i32, ord("+"))))
+        builder.cbranch(has_sign, take_sign, digits)
+
+        builder.position_at_end(take_sign)
+        self._advance(builder)
+        builder.branch(digits)
+
+        builder.position_at_end(digits)
+        value = builder.phi(i32)
+        value.add_incoming(_const(i32, 0), signed)
+        value.add_incoming(_const(i32, 0), take_sign)
+        char = self._peek(builder, func, "digits")
+        offset = builder.sub(char, _const(i32, ord("0")))
+        builder.cbranch(builder.icmp_unsigned("<", offset, _const(i32, 10)), digit, done)
+
+        builder.position_at_end(digit)
+        self._advance(builder)
+        next_value = builder.add(builder.mul(value, _const(i32, 10)), offset)
+        value.add_incoming(next_value, digit)
+        builder.branch(digits)
+
+        builder.position_at_end(done)
+        builder.ret(builder.select(negative, builder.neg(value), value))
+
+
+def define_runtime(module, linkage='internal'):
+    return RuntimeBuilder(module, linkage).build()
+
+
+def runtime_module(triple=None):
+    module = ir.Module(name="chitii_runtime")
+    if triple:
+        module.triple = triple
+    define_runtime(module, linkage='external')
+    return module
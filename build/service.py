@@ -0,0 +1,306 @@
+import ctypes
+import queue
+import threading
+from contextlib import contextmanager
+
+from llvmlite import ir, binding
+from build.lexer import tokenize
+from build.parser import Parser
+from build.codegen import CodeGen, initialize_llvm
+from build.cache import default_cache, emit_entry
+from build.optimizer import optimize_ast
+
+# Generated code talks to these callbacks instead of the buffered runtime so that
+# each request's output lands in its own buffer rather than the process stdout.
+WRITE_INT_TYPE = ctypes.CFUNCTYPE(None, ctypes.c_int32)
+WRITE_STR_TYPE = ctypes.CFUNCTYPE(None, ctypes.c_char_p)
+READ_INT_TYPE = ctypes.CFUNCTYPE(ctypes.c_int32)
+TRAP_TYPE = ctypes.CFUNCTYPE(None, ctypes.c_char_p)
+ALLOC_TYPE = ctypes.CFUNCTYPE(ctypes.c_void_p, ctypes.c_int64)
+RELEASE_TYPE = ctypes.CFUNCTYPE(None, ctypes.c_void_p)
+
+# Programs run inside the server process, so anything that would crash a
+# native executable is checked and reported instead. Recursion is cut off
+# once it has used this much of the calling thread's stack.
+MAX_STACK_BYTES = 1 << 20
+
+# Arrays are allocated from the request's own buffers, which are dropped
+# when the request finishes, so nothing a program allocates outlives it.
+MAX_REQUEST_MEMORY = 256 * 1024 * 1024
+
+
+class ProgramError(Exception):
+    def __init__(self, message, output=""):
+        super().__init__(message)
+        self.output = output
+
+_current = threading.local()
+
+
+class RequestIO:
+    def __init__(self, stdin=""):
+        self.chunks = []
+        self.inputs = stdin.split()
+        self.input_pos = 0
+        self.error = None
+        self.allocations = {}
+        self.allocated = 0
+
+    def write(self, text):
+        self.chunks.append(text)
+
+    def read_int(self):
+        # Mirrors scanf("%d"): once a token fails to parse, nothing more is read
+        if self.input_pos >= len(self.inputs):
+            return 0
+        try:
+            value = int(self.inputs[self.input_pos])
+        except ValueError:
+            self.input_pos = len(self.inputs)
+            return 0
+        self.input_pos += 1
+        return value
+
+    def allocate(self, size):
+        if size < 0 or self.allocated + size > MAX_REQUEST_MEMORY:
+            return None
+        buf = ctypes.create_string_buffer(size)
+        address = ctypes.addressof(buf)
+        self.allocations[address] = buf
+        self.allocated += size
+        return address
+
+    def release(self, address):
+        buf = self.allocations.pop(address, None)
+        if buf is not None:
+            self.allocated -= len(buf)
+
+    def getvalue(self):
+        return "".join(self.chunks)
+
+
+@WRITE_INT_TYPE
+def _write_int(val):
+    _current.io.write(f"{val}\n")
+
+
+@WRITE_STR_TYPE
+def _write_str(text):
+    _current.io.write(text.decode("utf8"))
+
+
+@READ_INT_TYPE
+def _read_int():
+    return _current.io.read_int()
+
+
+@ALLOC_TYPE
+def _alloc(size):
+    return _current.io.allocate(size)
+
+
+@RELEASE_TYPE
+def _release(address):
+    _current.io.release(address)
+
+
+@TRAP_TYPE
+def _trap(message):
+    if _current.io.error is None:
+        _current.io.error = message.decode("utf8")
+
+
+_runtime_lock = threading.Lock()
+_runtime_registered = False
+
+
+def register_runtime():
+    global _runtime_registered
+    with _runtime_lock:
+        if _runtime_registered:
+            return
+        initialize_llvm()
+        binding.add_symbol("chitii_write_int", ctypes.cast(_write_int, ctypes.c_void_p).value)
+        binding.add_symbol("chitii_write_str", ctypes.cast(_write_str, ctypes.c_void_p).value)
+        binding.add_symbol("chitii_read_int", ctypes.cast(_read_int, ctypes.c_void_p).value)
+        binding.add_symbol("chitii_trap", ctypes.cast(_trap, ctypes.c_void_p).value)
+        binding.add_symbol("chitii_alloc", ctypes.cast(_alloc, ctypes.c_void_p).value)
+        binding.add_symbol("chitii_release", ctypes.cast(_release, ctypes.c_void_p).value)
+        _runtime_registered = True
+
+
+class CaptureCodeGen(CodeGen):
+    def setup_runtime(self):
+        i32 = ir.IntType(32)
+        voidptr_ty = ir.IntType(8).as_pointer()
+        self.write_int = ir.Function(self.module, ir.FunctionType(ir.VoidType(), [i32]), name="chitii_write_int")
+        self.write_str = ir.Function(self.module, ir.FunctionType(ir.VoidType(), [voidptr_ty]), name="chitii_write_str")
+        self.read_int_func = ir.Function(self.module, ir.FunctionType(i32, []), name="chitii_read_int")
+        self.trap = ir.Function(self.module, ir.FunctionType(ir.VoidType(), [voidptr_ty]), name="chitii_trap")
+        self.alloc_func = ir.Function(self.module, ir.FunctionType(voidptr_ty, [ir.IntType(64)]), name="chitii_alloc")
+        self.release_func = ir.Function(self.module, ir.FunctionType(ir.VoidType(), [voidptr_ty]), name="chitii_release")
+
+        # A failed check reports through chitii_trap, sets chitii.trapped and
+        # returns; every call site tests the flag, so execution unwinds back
+        # out of main without running anything else.
+        self.trapped = ir.GlobalVariable(self.module, ir.IntType(1), name="chitii.trapped")
+        self.trapped.linkage = 'internal'
+        self.trapped.initializer = ir.Constant(ir.IntType(1), 0)
+        self.builder.store(ir.Constant(ir.IntType(1), 0), self.trapped)
+
+        self.frame_address = ir.Function(self.module, ir.FunctionType(voidptr_ty, [i32]), name="llvm.frameaddress.p0i8")
+        self.stack_base = ir.GlobalVariable(self.module, ir.IntType(64), name="chitii.stackbase")
+        self.stack_base.linkage = 'internal'
+        self.stack_base.initializer = ir.Constant(ir.IntType(64), 0)
+        self.builder.store(self.stack_address(), self.stack_base)
+
+    def print_int(self, val):
+        self.builder.call(self.write_int, [val])
+
+    def print_string(self, text):
+        ptr = self.string_constant(text)
+        self.builder.call(self.write_str, [ptr])
+
+    def read_int(self):
+        return self.builder.call(self.read_int_func, [])
+
+    def flush_output(self):
+        pass
+
+    def runtime_check(self, failed, message=None):
+        func = self.builder.function
+        fail_block = func.append_basic_block("check.fail")
+        ok_block = func.append_basic_block("check.ok")
+        self.builder.cbranch(failed, fail_block, ok_block)
+
+        self.builder.position_at_end(fail_block)
+        if message is not None:
+            self.builder.call(self.trap, [self.string_constant(message)])
+            self.builder.store(ir.Constant(ir.IntType(1), 1), self.trapped)
+        self.builder.ret(ir.Constant(ir.IntType(32), 0))
+
+        self.builder.position_at_end(ok_block)
+
+    def allocate(self, size, zeroed):
+        # Request buffers always start zeroed
+        return self.builder.call(self.alloc_func, [size])
+
+    def free_array(self, arr):
+        self.builder.call(self.release_func, [self.builder.bitcast(arr, ir.IntType(8).as_pointer())])
+
+    def check_index(self, arr_ptr, idx_val):
+        length, _ = self.array_view(arr_ptr)
+        self.runtime_check(self.builder.icmp_unsigned(">=", idx_val, length), "Array index out of range")
+
+    def check_division(self, left, right, length=None):
+        i32 = ir.IntType(32)
+        if length is None:
+            self.runtime_check(self.builder.icmp_signed("==", right, ir.Constant(i32, 0)), "Division by zero")
+            overflow = self.builder.and_(self.builder.icmp_signed("==", left, ir.Constant(i32, -2 ** 31)),
+                                         self.builder.icmp_signed("==", right, ir.Constant(i32, -1)))
+            self.runtime_check(overflow, "Integer overflow in division")
+            return
+        kernel = self.arrays.division_faults(isinstance(left.type, ir.PointerType), isinstance(right.type, ir.PointerType))
+        faults = self.builder.call(kernel, [left, right, length])
+        self.runtime_check(self.builder.icmp_signed("!=", faults, ir.Constant(i32, 0)),
+                           "Division by zero or overflow in array division")
+
+    def check_allocation(self, raw):
+        self.runtime_check(self.builder.icmp_unsigned("==", raw, ir.Constant(raw.type, None)), "Out of memory")
+
+    def stack_address(self):
+        frame = self.builder.call(self.frame_address, [ir.Constant(ir.IntType(32), 0)])
+        return self.builder.ptrtoint(frame, ir.IntType(64))
+
+    def gen_function_call(self, node):
+        # The stack grows down from the frame main was entered with
+        used = self.builder.sub(self.builder.load(self.stack_base), self.stack_address())
+        self.runtime_check(self.builder.icmp_unsigned(">", used, ir.Constant(ir.IntType(64), MAX_STACK_BYTES)),
+                           "Maximum recursion depth exceeded")
+        result = super().gen_function_call(node)
+        self.runtime_check(self.builder.load(self.trapped))
+        return result
+
+
+class JITEngine:
+    def __init__(self):
+        # LLVM contexts are not thread-safe, so every engine owns one and only
+        # the thread currently holding the engine touches it.
+        self.context = binding.create_context()
+        target = binding.Target.from_default_triple()
+        self.target_machine = target.create_target_machine()
+        backing_mod = binding.parse_assembly("", context=self.context)
+        self.engine = binding.create_mcjit_compiler(backing_mod, self.target_machine)
+        self.runs = 0
+
+    def emit(self, llvm_ir, opt_level=0):
+        return emit_entry(llvm_ir, self.target_machine, self.context, opt_level)
+
+    def run(self, object_code):
+        # The most recently loaded object wins symbol lookup, so each run
+        # resolves its own main even though earlier objects stay loaded.
+        self.engine.add_object_file(binding.ObjectFileRef.from_data(object_code))
+        self.engine.finalize_object()
+        self.runs += 1
+        func_ptr = self.engine.get_function_address("main")
+        cfunc = ctypes.CFUNCTYPE(ctypes.c_int)(func_ptr)
+        return cfunc()
+
+    def close(self):
+        self.engine.close()
+
+
+class EnginePool:
+    def __init__(self, size=4, max_runs=256):
+        register_runtime()
+        self.size = size
+        # MCJIT never releases loaded object code, so engines are replaced
+        # once they have run max_runs programs.
+        self.max_runs = max_runs
+        self.engines = queue.Queue()
+        for _ in range(size):
+            self.engines.put(JITEngine())
+
+    @contextmanager
+    def acquire(self):
+        engine = self.engines.get()
+        try:
+            yield engine
+        finally:
+            if engine.runs >= self.max_runs:
+                engine.close()
+                engine = JITEngine()
+            self.engines.put(engine)
+
+
+class CompileService:
+    def __init__(self, pool_size=4, cache=None):
+        self.pool = EnginePool(pool_size)
+        self.cache = cache if cache is not None else default_cache()
+
+    def compile(self, source_code, opt_level=0):
+        tokens = tokenize(source_code)
+        parser = Parser(tokens)
+        ast = optimize_ast(parser.parse(), opt_level)
+
+        codegen = CaptureCodeGen()
+        codegen.generate(ast)
+        return codegen.finish()
+
+    def run(self, source_code, stdin="", opt_level=0):
+        key = self.cache.key(source_code, opt_level, variant="capture")
+        entry = self.cache.get(key)
+        llvm_ir = self.compile(source_code, opt_level) if entry is None else None
+        io = RequestIO(stdin)
+        with self.pool.acquire() as engine:
+            if entry is None:
+                entry = engine.emit(llvm_ir, opt_level)
+                self.cache.put(key, entry)
+            _current.io = io
+            try:
+                result = engine.run(entry.object_code)
+            finally:
+                _current.io = None
+        if io.error is not None:
+            raise ProgramError(f"Runtime error: {io.error}", io.getvalue())
+        return io.getvalue(), result, entry.instructions
@@ -0,0 +1,147 @@
+import ctypes
+
+from llvmlite import ir, binding
+from build.lexer import tokenize
+from build.parser import Parser
+from build.codegen import CodeGen, initialize_llvm
+from build.optimizer import optimize_ast, optimize_module
+from build.runtime import declare_runtime, runtime_module
+
+
+class SessionCodeGen(CodeGen):
+    # Top-level variables become globals and functions keep external linkage,
+    # so later lines can declare and use them without regenerating anything.
+    def __init__(self, session, entry_name):
+        super().__init__(entry_name=entry_name)
+        self.session = session
+        self.new_globals = {}
+        self.new_functions = {}
+        self.new_symbols = set()
+
+    def setup_runtime(self):
+        # The session loads the runtime once; each line only declares it
+        self.runtime = declare_runtime(self.module)
+
+    def at_top_level(self):
+        return self.builder.function is self.main_func
+
+    def fresh_symbol(self, base):
+        symbol = base
+        n = 0
+        while symbol in self.session.symbols or symbol in self.new_symbols:
+            n += 1
+            symbol = f"{base}.{n}"
+        self.new_symbols.add(symbol)
+        return symbol
+
+    def global_ref(self, symbol, ty, define=False):
+        try:
+            return self.module.get_global(symbol)
+        except KeyError:
+            pass
+        gv = ir.GlobalVariable(self.module, ty, name=symbol)
+        if define:
+            gv.initializer = ir.Constant(ty, None)
+        return gv
+
+    def session_global(self, name, ty):
+        known = self.new_globals.get(name) or self.session.globals.get(name)
+        if known is not None and known[1] == ty:
+            gv = self.global_ref(known[0], ty)
+        else:
+            symbol = self.fresh_symbol(f"var.{name}")
+            gv = self.global_ref(symbol, ty, define=True)
+            self.new_globals[name] = (symbol, ty)
+        self.variables[name] = gv
+        return gv
+
+    def alloc_variable(self, name, ty=ir.IntType(32)):
+        if not self.at_top_level():
+            return super().alloc_variable(name, ty)
+        return self.session_global(name, ty)
+
+    def bind_array(self, name, arr_ptr):
+        if not self.at_top_level():
+            return super().bind_array(name, arr_ptr)
+        gv = self.session_global(name, arr_ptr.type.pointee)
+        self.builder.store(self.builder.load(arr_ptr), gv)
+        return gv
+
+    def find_variable(self, name):
+        if name not in self.variables and self.at_top_level():
+            known = self.session.globals.get(name)
+            if known is not None:
+                self.variables[name] = self.global_ref(*known)
+        return super().find_variable(name)
+
+    def declare_function(self, name, func_type):
+        # External, since later lines call it from their own modules
+        symbol = self.fresh_symbol(f"fn.{name}")
+        func = ir.Function(self.module, func_type, name=symbol)
+        self.functions[name] = func
+        self.new_functions[name] = (symbol, func_type)
+        return func
+
+    def lookup_function(self, name):
+        if name not in self.functions:
+            known = self.session.functions.get(name)
+            if known is not None:
+                symbol, func_type = known
+                self.functions[name] = ir.Function(self.module, func_type, name=symbol)
+        return super().lookup_function(name)
+
+
+class JITSession:
+    def __init__(self, opt_level=0):
+        initialize_llvm()
+        self.opt_level = opt_level
+        self.instructions = (0, 0)
+        target = binding.Target.from_default_triple()
+        self.target_machine = target.create_target_machine()
+        backing_mod = binding.parse_assembly("")
+        self.engine = binding.create_mcjit_compiler(backing_mod, self.target_machine)
+
+        runtime = binding.parse_assembly(str(runtime_module(binding.get_default_triple())))
+        runtime.verify()
+        self.engine.add_module(runtime)
+        self.engine.finalize_object()
+
+        # name -> (symbol, type) of everything defined by earlier lines
+        self.globals = {}
+        self.functions = {}
+        self.symbols = set()
+        self.lines = 0
+
+    def run(self, source_code):
+        tokens = tokenize(source_code)
+        parser = Parser(tokens, self.functions)
+        ast = optimize_ast(parser.parse(), self.opt_level, keep_globals=True)
+
+        entry_name = f"__line{self.lines}"
+        codegen = SessionCodeGen(self, entry_name)
+        codegen.generate(ast)
+        llvm_ir = codegen.finish()
+
+        # llvmlite builds IR in Python and can only hand it to LLVM as text,
+        # so each line pays for one print/parse round trip; it is limited to
+        # the line's own module, never the whole session.
+        mod = binding.parse_assembly(str(llvm_ir))
+        mod.verify()
+        self.instructions = optimize_module(mod, self.opt_level, self.target_machine)
+
+        # Only the new line's module is compiled; earlier modules stay loaded
+        # and their symbols are resolved by name.
+        self.engine.add_module(mod)
+        self.lines += 1
+        self.engine.finalize_object()
+
+        self.globals.update(codegen.new_globals)
+        self.functions.update(codegen.new_functions)
+        self.symbols.update(codegen.new_symbols)
+
+        func_ptr = self.engine.get_function_address(entry_name)
+        cfunc = ctypes.CFUNCTYPE(ctypes.c_int)(func_ptr)
+        return cfunc()
+
+    def close(self):
+        self.engine.close()
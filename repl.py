@@ -1,50 +1,69 @@
 from build.lexer import tokenize
 from build.parser import Parser
-from build.codegen import CodeGen
+from build.codegen import CodeGen, initialize_llvm
+from build.cache import default_cache, emit_entry
+from build.session import JITSession
+from build.optimizer import OPT_LEVELS, optimize_ast
 from llvmlite import binding
+import argparse
 import ctypes
 
-def compile_and_run(source_code):
-    tokens = tokenize(source_code)
-    parser = Parser(tokens)
-    ast = parser.parse()
+def compile_and_run(source_code, cache=None, opt_level=0):
+    cache = cache if cache is not None else default_cache()
 
-    codegen = CodeGen()
-    codegen.generate(ast)
-    llvm_ir = codegen.finish()
-
-    binding.initialize()
-    binding.initialize_native_target()
-    binding.initialize_native_asmprinter()
+    initialize_llvm()
 
     target = binding.Target.from_default_triple()
     target_machine = target.create_target_machine()
 
+    key = cache.key(source_code, opt_level)
+    entry = cache.get(key)
+    if entry is None:
+        tokens = tokenize(source_code)
+        parser = Parser(tokens)
+        ast = optimize_ast(parser.parse(), opt_level)
+
+        codegen = CodeGen()
+        codegen.generate(ast)
+        llvm_ir = codegen.finish()
+
+        entry = emit_entry(llvm_ir, target_machine, opt_level=opt_level)
+        cache.put(key, entry)
+
     backing_mod = binding.parse_assembly("")
     engine = binding.create_mcjit_compiler(backing_mod, target_machine)
 
-    mod = binding.parse_assembly(str(llvm_ir))
-    mod.verify()
-
-    engine.add_module(mod)
-    engine.finalize_object()
+    try:
+        engine.add_object_file(binding.ObjectFileRef.from_data(entry.object_code))
+        engine.finalize_object()
 
-    func_ptr = engine.get_function_address("main")
-    cfunc = ctypes.CFUNCTYPE(ctypes.c_int)(func_ptr)
+        func_ptr = engine.get_function_address("main")
+        cfunc = ctypes.CFUNCTYPE(ctypes.c_int)(func_ptr)
 
-    return cfunc()
+        return cfunc()
+    finally:
+        # The engine owns the loaded object code and the target machine
+        engine.close()
 
-def repl():
+def repl(opt_level=0):
     print("Welcome to chitii_the_compiler REPL! Type 'exit' to quit.")
+    session = JITSession(opt_level)
     while True:
         try:
             code = input('>>> ')
             if code.strip().lower() == "exit":
                 break
-            result = compile_and_run(code)
+            result = session.run(code)
             print("Result:", result)
+            if opt_level:
+                before, after = session.instructions
+                print(f"Instructions: {before} -> {after}")
         except Exception as e:
             print("Error:", e)
 
 if __name__ == "__main__":
-    repl()
+    arg_parser = argparse.ArgumentParser(description="chitii_the_compiler REPL")
+    arg_parser.add_argument("-O", dest="opt_level", type=int, choices=OPT_LEVELS, default=0,
+                            help="optimization level (0-3)")
+    args = arg_parser.parse_args()
+    repl(args.opt_level)
@@ -1,9 +1,13 @@
 from flask import Flask, request, jsonify, send_from_directory
-import subprocess
-import os
+from build.service import CompileService, ProgramError
+from build.optimizer import OPT_LEVELS
 
 app = Flask(__name__)
 
+# Programs are compiled and run in-process on a pool of JIT engines, so
+# concurrent requests never share files or spawn compiler processes.
+service = CompileService()
+
 @app.route('/')
 def serve_index():
     return send_from_directory('.', 'index.html')
@@ -13,25 +17,19 @@ def compile_code():
     code = request.json.get('code')
     if not code:
         return jsonify({'error': 'No code provided'}), 400
-
-    # Save input code to a file your compiler expects
-    with open('program.txt', 'w') as f:
-        f.write(code)
-
-    # Run your compiler (adjust if needed)
-    result = subprocess.run(['python', '-m', 'build.main'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    if result.returncode != 0:
-        return jsonify({'error': result.stderr})
-
-    # Compile LLVM IR to executable
-    clang_result = subprocess.run(['clang', 'program.ll', '-o', 'program.exe'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    if clang_result.returncode != 0:
-        return jsonify({'error': clang_result.stderr})
-
-    # Run executable and collect output
-    exec_result = subprocess.run(['./program.exe'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-
-    return jsonify({'output': exec_result.stdout, 'error': exec_result.stderr})
+    stdin = request.json.get('input', '')
+    opt_level = request.json.get('opt_level', 0)
+    if opt_level not in OPT_LEVELS:
+        return jsonify({'error': f'Invalid opt_level {opt_level}'}), 400
+
+    try:
+        output, _, (before, after) = service.run(code, stdin, opt_level)
+    except ProgramError as e:
+        return jsonify({'output': e.output, 'error': str(e)})
+    except Exception as e:
+        return jsonify({'error': str(e)})
+
+    return jsonify({'output': output, 'error': '', 'instructions': {'before': before, 'after': after}})
 
 if __name__ == "__main__":
     app.run(debug=True)
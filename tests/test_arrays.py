@@ -0,0 +1,51 @@
+import pytest
+
+from build.cache import CompileCache
+from build.service import CompileService
+
+
+@pytest.fixture(scope="module")
+def service(tmp_path_factory):
+    return CompileService(pool_size=1, cache=CompileCache(cache_dir=str(tmp_path_factory.mktemp("cache"))))
+
+
+def run(service, source, opt_level=0):
+    return service.run(source, "", opt_level)[0].split()
+
+
+@pytest.mark.parametrize("opt_level", [0, 2])
+def test_fill_writes_literal_array_in_place(service, opt_level):
+    source = "arr = [1, 2, 3, 4]\nfill(arr, 7)\nprint arr[0]\nprint sum(arr)\nb = fill(arr, 2)\nb[0] = 100\nprint arr[0]\nprint sum(b)"
+    assert run(service, source, opt_level) == ["7", "28", "2", "106"]
+
+
+@pytest.mark.parametrize("opt_level", [0, 2])
+def test_heap_array_operations(service, opt_level):
+    source = "a = fill(array(21), 3)\nb = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]\nc = a * b - 1\nprint len(c)\nprint sum(c)\nprint max(b + a)\nprint min(copy(c))"
+    assert run(service, source, opt_level) == ["10", "155", "13", "2"]
+
+
+def test_assignment_copies_heap_arrays(service):
+    source = "a = fill(array(4), 5)\nb = a\nb[0] = 1\na = array(2)\nprint sum(b)\nprint len(a)"
+    assert run(service, source) == ["16", "2"]
+
+
+def test_arrays_are_freed(service):
+    # Each call allocates 12 MB of locals and temporaries; without freeing,
+    # 40 calls would exceed the per-request memory limit
+    body = "func f(x) {\n t = array(1000000) + x\n u = t\n return sum(u * 2 + 1) / 1000000\n}\n"
+    assert run(service, body + "\n".join(["f(1)"] * 40)) == ["3"] * 40
+
+
+def test_rebinding_to_literal_frees_heap_array(service):
+    body = "func g(x) {\n t = array(1000000)\n t = [5, x]\n return sum(t)\n}\n"
+    assert run(service, body + "\n".join(["g(1)"] * 80)) == ["6"] * 80
+    assert run(service, "a = fill(array(3), 2)\na = [5, 6]\nprint sum(a)") == ["11"]
+
+
+@pytest.mark.parametrize("name", ["malloc", "calloc", "free"])
+def test_functions_named_like_allocator(service, name):
+    func = f"func {name}(a) {{\n return a + 1\n}}\n"
+    uses_arrays = "b = array(3) + 1\nprint sum(b)\n"
+    assert run(service, func + uses_arrays + f"print {name}(1)") == ["3", "2", "2"]
+    assert run(service, uses_arrays + func + f"print {name}(1)") == ["3", "2", "2"]
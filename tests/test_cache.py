@@ -0,0 +1,81 @@
+import os
+import shutil
+
+from build import cache as cache_module
+from build.cache import CacheEntry, CompileCache, hash_sources
+
+
+def entry(n, size=0):
+    return CacheEntry(f"; module {n}", b"\x7fELF" + b"\0" * size, (n, n))
+
+
+def test_entry_round_trip():
+    original = CacheEntry("; ir é", b"object", (7, 3))
+    loaded = CacheEntry.from_bytes(original.to_bytes())
+    assert (loaded.llvm_ir, loaded.object_code, loaded.instructions) == ("; ir é", b"object", (7, 3))
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = CompileCache(max_entries=2, cache_dir=None)
+    cache.put("a", entry(1))
+    cache.put("b", entry(2))
+    assert cache.get("a") is not None  # a is now the most recently used
+    cache.put("c", entry(3))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats() == {"hits": 3, "disk_hits": 0, "misses": 1, "entries": 2}
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    CompileCache(cache_dir=str(tmp_path)).put("k", entry(5))
+    cache = CompileCache(cache_dir=str(tmp_path))
+    loaded = cache.get("k")
+    assert loaded.llvm_ir == "; module 5" and loaded.instructions == (5, 5)
+    assert cache.get("k") is not None
+    assert cache.get("missing") is None
+    assert cache.stats() == {"hits": 1, "disk_hits": 1, "misses": 1, "entries": 1}
+
+
+def test_disk_tier_is_size_bounded(tmp_path):
+    size = len(entry(0, 1000).to_bytes())
+    cache = CompileCache(cache_dir=str(tmp_path), max_disk_bytes=3 * size)
+    for n in range(3):
+        cache.put(f"k{n}", entry(n, 1000))
+        # mtimes are the last-used times; keep them strictly ordered
+        os.utime(tmp_path / f"k{n}.entry", (n, n))
+    cache.put("k3", entry(3, 1000))
+    assert sorted(os.listdir(tmp_path)) == ["k1.entry", "k2.entry", "k3.entry"]
+
+
+def test_corrupt_entries_are_discarded(tmp_path):
+    cache = CompileCache(cache_dir=str(tmp_path))
+    (tmp_path / "short.entry").write_bytes(b"junk")
+    truncated = entry(1).to_bytes()[:20]
+    (tmp_path / "truncated.entry").write_bytes(truncated)
+    assert cache.get("short") is None
+    assert cache.get("truncated") is None
+    assert os.listdir(tmp_path) == []
+    assert cache.stats()["misses"] == 2
+
+
+def test_key_depends_on_inputs():
+    key = CompileCache.key("x = 1")
+    assert key == CompileCache.key("x = 1")
+    assert key != CompileCache.key("x = 2")
+    assert key != CompileCache.key("x = 1", opt_level=2)
+    assert key != CompileCache.key("x = 1", variant="capture")
+
+
+def test_compiler_changes_invalidate_keys(tmp_path, monkeypatch):
+    package_dir = tmp_path / "build"
+    shutil.copytree(os.path.dirname(cache_module.__file__), package_dir,
+                    ignore=shutil.ignore_patterns("__pycache__"))
+    before = hash_sources(str(package_dir))
+    with open(package_dir / "codegen.py", "a") as f:
+        f.write("\n# edited\n")
+    after = hash_sources(str(package_dir))
+    assert before != after
+
+    key = CompileCache.key("x = 1")
+    monkeypatch.setattr(cache_module, "_fingerprint", after)
+    assert CompileCache.key("x = 1") != key
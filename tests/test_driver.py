@@ -0,0 +1,52 @@
+import os
+
+from build.driver import build, object_path_for
+
+
+def write_sources(directory, count):
+    sources = []
+    for i in range(count):
+        path = directory / f"prog{i}.txt"
+        path.write_text(f"func f(x) {{\n return x * {i + 2}\n}}\nprint f(input())")
+        sources.append(str(path))
+    return sources
+
+
+def built_paths(results):
+    return sorted(source_path for source_path, _, _ in results)
+
+
+def test_rebuild_skips_unchanged_files(tmp_path):
+    sources = write_sources(tmp_path, 3)
+    out_dir = str(tmp_path / "out")
+
+    results, skipped, errors, _ = build(sources, out_dir, jobs=1)
+    assert not errors and not skipped
+    assert built_paths(results) == sorted(sources)
+    assert all(os.path.exists(object_path_for(s, out_dir)) for s in sources)
+
+    results, skipped, errors, _ = build(sources, out_dir, jobs=1)
+    assert not errors and not results
+    assert sorted(skipped) == sorted(sources)
+
+    with open(sources[1], "a") as f:
+        f.write("\nprint 1")
+    results, skipped, errors, _ = build(sources, out_dir, jobs=1)
+    assert not errors
+    assert built_paths(results) == [sources[1]]
+    assert sorted(skipped) == sorted([sources[0], sources[2]])
+
+
+def test_missing_object_or_force_rebuilds(tmp_path):
+    sources = write_sources(tmp_path, 2)
+    out_dir = str(tmp_path / "out")
+    build(sources, out_dir, jobs=1)
+
+    os.remove(object_path_for(sources[0], out_dir))
+    results, skipped, _, _ = build(sources, out_dir, jobs=1)
+    assert built_paths(results) == [sources[0]]
+    assert skipped == [sources[1]]
+
+    results, skipped, _, _ = build(sources, out_dir, jobs=1, force=True)
+    assert built_paths(results) == sorted(sources)
+    assert not skipped
@@ -0,0 +1,86 @@
+import random
+
+import pytest
+
+from build.lexer import get_token, tokenize, tokenize_file, TokenStream
+
+
+def reference_tokenize(code):
+    # The original one-token-at-a-time lexer built on master_regex
+    tokens = []
+    pos = 0
+    while pos < len(code):
+        match = get_token(code, pos)
+        kind = match.lastgroup
+        value = match.group()
+        if kind == 'MISMATCH':
+            raise SyntaxError(f'Unexpected token: {value}')
+        if kind == 'STRING':
+            value = value[1:-1]
+        if kind not in ('SKIP', 'NEWLINE', 'COMMENT'):
+            tokens.append((kind, value))
+        pos = match.end()
+    return tokens
+
+
+def stream_tokens(source):
+    stream = TokenStream(source, chunk_size=3)
+    tokens = []
+    index = 0
+    while stream.kind(index) is not None:
+        tokens.append(stream[index])
+        index += 1
+    return tokens
+
+
+@pytest.mark.parametrize('source', [
+    'x = 1 ',
+    'x = 1\t\n',
+    'x = 1 \t \n  ',
+    'x = 1 # note',
+    'x = 1\n# trailing comment\n',
+    'x = 1\n# trailing comment',
+    'x = 1 # ends in a quote "',
+    '# only a comment',
+    '   ',
+    '',
+])
+def test_trailing_whitespace_and_comments(source):
+    expected = [] if source.strip().startswith('#') or not source.strip() else [('ID', 'x'), ('ASSIGN', '='), ('NUMBER', '1')]
+    assert tokenize(source) == expected
+    assert stream_tokens(source) == expected
+    assert stream_tokens(source.encode()) == expected
+
+
+def test_file_with_trailing_comment(tmp_path):
+    path = tmp_path / 'program.txt'
+    path.write_text('x = 1\nprint x # show it\n# done \n')
+    stream = tokenize_file(str(path))
+    assert [stream[i] for i in range(4)] == [('ID', 'x'), ('ASSIGN', '='), ('NUMBER', '1'), ('PRINT', 'print')]
+    assert stream[4] == ('ID', 'x')
+    assert stream.kind(5) is None
+
+
+def test_mismatch_reports_position():
+    with pytest.raises(SyntaxError, match='Unexpected token: \\$ at line 2, column 5'):
+        tokenize('x = 1\ny = $ ')
+    with pytest.raises(SyntaxError, match='Unexpected token: \\$'):
+        stream_tokens(b'x = 1 $')
+
+
+def test_matches_reference_lexer():
+    pieces = ['x', 'print', 'func', 'return', '12', '"s # t"', '"', '=', '+', '-', '*', '/', '(', ')',
+              '{', '}', '[', ']', ',', ';', ' ', '\t', '\n', '# c', '$', 'printx']
+    rng = random.Random(5)
+    for _ in range(2000):
+        source = ''.join(rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+        try:
+            expected = reference_tokenize(source)
+        except SyntaxError:
+            with pytest.raises(SyntaxError):
+                tokenize(source)
+            with pytest.raises(SyntaxError):
+                stream_tokens(source.encode())
+            continue
+        assert tokenize(source) == expected, source
+        assert stream_tokens(source.encode()) == expected, source
@@ -0,0 +1,24 @@
+from build.codegen import CodeGen
+from build.lexer import tokenize
+from build.my_ast import Number
+from build.optimizer import optimize_ast
+from build.parser import Parser
+
+
+def parse(source):
+    return Parser(tokenize(source)).parse()
+
+
+def test_long_operator_chain():
+    # Deeper than the recursion limit: every walk over the tree must be iterative
+    ast = parse("v = input()\nx = " + " + ".join(["v"] * 5000) + "\ny = " + " + ".join(["1"] * 5000) + "\nprint x + y")
+    assert repr(ast).count("BinOp(") == 2 * 4999 + 1
+    for opt_level in (0, 1, 2):
+        CodeGen().generate(optimize_ast(ast, opt_level))
+    folded = optimize_ast(ast, 1)
+    assert isinstance(folded[2].value, Number) and folded[2].value.value == 5000
+
+
+def test_deep_right_nesting():
+    ast = parse("v = input()\nprint " + "v - (" * 3000 + "1" + ")" * 3000)
+    CodeGen().generate(optimize_ast(ast, 2))
@@ -0,0 +1,34 @@
+import pytest
+
+from build.lexer import tokenize
+from build.my_ast import ArrayReduce, FunctionCall, Print
+from build.parser import Parser
+
+
+def parse(source, functions=()):
+    return Parser(tokenize(source), functions).parse()
+
+
+def test_array_builtins():
+    ast = parse("a = [1, 2]\nprint max(a)")
+    assert isinstance(ast[1].value, ArrayReduce)
+    with pytest.raises(SyntaxError, match="max\\(\\) takes 1 argument"):
+        parse("print max(1, 2)")
+
+
+def test_user_function_shadows_builtin():
+    ast = parse("func max(a, b) {\n return a\n}\nprint max(1, 2)")
+    assert isinstance(ast[1], Print)
+    assert isinstance(ast[1].value, FunctionCall)
+    assert ast[1].value.name == "max"
+
+
+def test_recursive_function_named_like_builtin():
+    ast = parse("func sum(n) {\n return sum(n - 1)\n}")
+    assert isinstance(ast[0].body[0].value, FunctionCall)
+
+
+def test_functions_defined_earlier_in_session():
+    ast = parse("print len(3)", functions={"len"})
+    assert isinstance(ast[0].value, FunctionCall)
+
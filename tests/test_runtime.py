@@ -0,0 +1,79 @@
+import shutil
+import subprocess
+
+import pytest
+
+from build.bench_io import build_executable
+from build.codegen import CodeGen, StdioCodeGen
+from build.runtime import BUFFER_SIZE
+
+CC = shutil.which("cc") or shutil.which("gcc") or shutil.which("clang")
+
+pytestmark = pytest.mark.skipif(CC is None, reason="needs a C compiler to link executables")
+
+
+@pytest.fixture(scope="module")
+def build(tmp_path_factory):
+    out_dir = tmp_path_factory.mktemp("exe")
+    built = {}
+
+    def build(source_code, codegen_cls):
+        key = (source_code, codegen_cls)
+        if key not in built:
+            path = str(out_dir / f"prog{len(built)}")
+            build_executable(source_code, codegen_cls, path, CC)
+            built[key] = path
+        return built[key]
+
+    return build
+
+
+def run(path, stdin=""):
+    return subprocess.run([path], input=stdin.encode(), capture_output=True, check=True).stdout
+
+
+READ_PROGRAM = "a = input()\nprint a\nb = input()\nprint b\nc = input()\nprint c"
+
+
+@pytest.mark.parametrize("stdin", [
+    "-2147483648 2147483647 0",
+    "- 5 6",
+    "+5 -0 7",
+    "12abc 4 5",
+    "\v\f 8\t\n9\r\n 10",
+    "3",
+    "",
+])
+def test_input_matches_scanf(build, stdin):
+    assert run(build(READ_PROGRAM, CodeGen), stdin) == run(build(READ_PROGRAM, StdioCodeGen), stdin)
+
+
+def test_output_matches_printf(build):
+    values = [0, 7, -7, 10, -10, 2147483647, -2147483647]
+    lines = [f"print {v}" if v >= 0 else f"print 0 - {-v}" for v in values]
+    lines += ["print 0 - 2147483647 - 1", 'print "text"', 'print ""']
+    source = "\n".join(lines)
+    assert run(build(source, CodeGen)) == run(build(source, StdioCodeGen))
+
+
+def test_large_output_and_input(build):
+    # Well over one buffer of output, with prompts interleaved with reads
+    # and a string longer than the buffer written directly
+    lines = []
+    for i in range(3000):
+        lines.append(f"v = input()\nprint v + {i * 7919}")
+        lines.append(f'print "line {i} "')
+    lines.append('print "' + "x" * (BUFFER_SIZE + 100) + '"')
+    lines.append("print 1")
+    source = "\n".join(lines)
+    stdin = " ".join(str(i * 31 - 5000) for i in range(3000))
+    native = run(build(source, CodeGen), stdin)
+    assert len(native) > BUFFER_SIZE
+    assert native == run(build(source, StdioCodeGen), stdin)
+
+
+def test_user_functions_named_like_libc(build):
+    source = ("func write(a) {\n return a + 1\n}\n"
+              "func read(a) {\n return a * 2\n}\n"
+              "print write(1)\nprint read(input())")
+    assert run(build(source, CodeGen), "21") == b"2\n2\n42\n42\n"